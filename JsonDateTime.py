@@ -4,6 +4,8 @@ from datetime import datetime
 
 
 class JsonDateTime(datetime):
+    __slots__ = ()
+
     @property
     def dict_(self):
         """Return self translated to dictionary"""
@@ -0,0 +1,150 @@
+"""
+Non-interactive scraping of many schedules in one logged in browser session
+
+The config is a json file:
+{
+    "username": "ab61274",
+    "headless": true,
+    "targets": [
+        {"school": "...", "type": "class", "id": "7A", "weeks": "34-36", "output": "7A.jsonl"},
+        {"school": "...", "type": "personal id", "id": "abc123", "weeks": [34, 35]}
+    ]
+}
+with "cache": "path/to/cache.json" in the config, weeks that haven't changed since the last run aren't parsed again
+with "source": "api" the weeks are read from the timetable viewer's json api instead of the rendered page,
+the browser is only used to log in, "api url" and "host name" override timetable_api.API_URL and HOST_NAME,
+the cache doesn't apply to the api
+the password is read from the SCHEDULE_MIGRATER_PASSWORD environment variable, or asked for
+"""
+
+from scraper import Schedule
+from JsonDateTime import JsonDateTime
+from normalize import Normalized
+import storage
+from weekcache import WeekCache
+
+from getpass import getpass
+import json
+import os
+import sys
+
+
+class Target:
+    def __init__(self, school, sche_type, schedule_id, weeks, output=None):
+        self.school = school
+        self.sche_type = sche_type
+        self.schedule_id = schedule_id
+        self.weeks = weeks
+        self.output = output or self.default_output(sche_type, schedule_id)
+
+    def __str__(self):
+        return f'{self.school} {self.sche_type} {self.schedule_id} weeks {self.weeks[0]}-{self.weeks[-1]}'
+
+    @classmethod
+    def from_dict(cls, dict_):
+        return cls(
+            dict_['school'],
+            dict_['type'],
+            dict_['id'],
+            Schedule.parse_weeks(dict_['weeks']),
+            dict_.get('output')
+        )
+
+    @staticmethod
+    def default_output(sche_type, schedule_id):
+        return f'{sche_type.replace(" ", "_")}_{schedule_id}.jsonl'
+
+
+def load_config(path):
+    with open(path, 'r') as file:
+        config = json.load(file)
+    config['targets'] = [Target.from_dict(target) for target in config['targets']]
+    return config
+
+
+def get_password():
+    return os.environ.get('SCHEDULE_MIGRATER_PASSWORD') or getpass('password: ')
+
+
+def scrape_targets(browser, targets, dt, cache=None, client=None):
+    """
+    Yield (target, Schedule, changes) for each target, browser has to be logged in
+    with a weekcache.WeekCache, weeks that haven't changed since the last run are read from it instead of parsed,
+    changes are the changed weeks to put in it once the schedule is saved, see Schedule.get_changed_weeks
+
+    :param client: timetable_api.TimetableClient, read the weeks through the api instead of browser
+    """
+
+    for target in targets:
+        if client is not None:
+            schedule, days_updated = client.get_weeks(
+                target.school, target.sche_type, target.schedule_id, target.weeks, dt
+            )
+            yield target, Schedule(schedule, dt, days_updated), []
+            continue
+        schedule, days_updated, changes = Schedule.get_changed_weeks(
+            browser,
+            target.school,
+            target.sche_type,
+            target.schedule_id,
+            target.weeks,
+            dt,
+            cache
+        )
+        if cache is not None:
+            # the output is rewritten as a whole, so it needs the unchanged weeks too
+            changed = {key for key, _, _, _ in changes}
+            for week in target.weeks:
+                key = cache.key(target.school, target.sche_type, target.schedule_id, dt.year, week)
+                cached = cache.get(key) if key not in changed else None
+                if cached is not None:
+                    schedule += cached[0]
+                    days_updated += cached[1]
+            schedule = Normalized.from_events(schedule).events
+        yield target, Schedule(schedule, dt, sorted(days_updated)), changes
+
+
+def run(config, password):
+    """Log in once and write one Schedule per target"""
+
+    dt = JsonDateTime.now()
+    client = None
+    use_api = config.get('source') == 'api'
+    cache = WeekCache(config['cache']) if config.get('cache') and not use_api else None
+    browser = Schedule.start_browser(config.get('headless', True))
+    try:
+        Schedule.login(browser, config['username'], password)
+        if use_api:
+            client = api_client(browser, config)
+        for target, schedule, changes in scrape_targets(browser, config['targets'], dt, cache, client):
+            if cache is not None and not changes and os.path.exists(target.output):
+                print(f'{target}: unchanged')
+                continue
+            storage.save(schedule, target.output)
+            # only weeks that made it to disk are cached, the others are parsed again next run
+            for change in changes:
+                cache.put(*change)
+            print(f'{target}: {len(schedule)} events -> {target.output}')
+    finally:
+        browser.quit()
+        if cache is not None:
+            cache.save()
+
+
+def api_client(browser, config):
+    from timetable_api import TimetableClient, API_URL, HOST_NAME  # only needed with "source": "api"
+
+    return TimetableClient.from_browser(
+        browser,
+        api_url=config.get('api url', API_URL),
+        host_name=config.get('host name', HOST_NAME)
+    )
+
+
+def main(config_path):
+    config = load_config(config_path)
+    run(config, get_password())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
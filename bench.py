@@ -0,0 +1,319 @@
+"""
+Benchmarks on synthetic data, nothing here needs a browser or the network
+
+Usage:
+    python bench.py layout [lessons per day ...]    LayoutIndex against the old scan of every timestamp and attribute per box
+    python bench.py storage [events]                save and load time and file size of each storage format
+    python bench.py memory [events] [elements]      memory held by events and page elements, with and without slots
+    python bench.py export [events]                 csv and ics export time and size, against the old strftime csv writer
+    python bench.py normalize [events ...]          Normalized.from_events on shuffled events with duplicates and split lessons
+"""
+
+from scraper import Schedule, Event, EventTable, SnappyElement, Coords, NON_CLASS_CLRS
+from JsonDateTime import JsonDateTime
+from normalize import Normalized
+import fixtures
+import export
+import storage
+
+from datetime import timedelta
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+YEAR = 2026
+EVENTS = 100000
+ELEMENTS = 10000
+LESSONS_PER_DAY = 8
+
+
+def scan_boxes(days, day_width, timestamps, attributes, boxes):
+    """
+    How parse matched boxes before layout.py, O(boxes * (timestamps + attributes))
+    same signature and output as Schedule.match_boxes, so it can be passed to parse as the engine
+    """
+
+    class_boxes = []
+    for box in boxes:
+        if days[0]['coords'].x <= box.coords.x <= days[-1]['coords'].x + day_width:
+            clr = tuple(int(num) for num in box.style['background-color'][4:-1].split(', '))
+            if clr not in NON_CLASS_CLRS:
+                class_boxes.append(box)
+
+    for box in class_boxes:
+        box_coords = box.coords
+        corner = Coords(
+            box_coords.x + int(box.style['width'][:-2]),
+            box_coords.y + int(box.style['height'][:-2])
+        )
+        for day in days[::-1]:
+            day_coords = day['coords']
+            if box_coords >= day_coords:
+                break
+
+        start, stop = False, False
+        for stamp in timestamps:
+            stamp_coords = stamp['coords']
+            if stamp_coords.y < box_coords.y and day_coords.x < stamp_coords.x < day_coords.x + day_width:
+                start = stamp['datetime']
+            if stamp_coords.y < corner.y and box_coords.x < stamp_coords.x < day_coords.x + day_width:
+                stop = stamp['datetime']
+        if start and stop:
+            yield start, stop, [attribute for attribute in attributes if box_coords < attribute.coords < corner]
+
+
+def synthetic_events(count, year=YEAR):
+    """count events, LESSONS_PER_DAY lessons every weekday from the first monday of year on"""
+
+    monday = JsonDateTime(year, 1, 1)
+    monday += timedelta(days=-monday.weekday() % 7)
+    events = []
+    for idx in range(count):
+        day, lesson = divmod(idx, LESSONS_PER_DAY)
+        week, weekday = divmod(day, 5)
+        start = monday + timedelta(weeks=week, days=weekday, hours=8 + lesson)
+        events.append(Event(f'subject {lesson}', f'room {idx % 30}', start, start + timedelta(minutes=50), 'info'))
+    return events
+
+
+class DictEvent:
+    """Event as it was before __slots__, for comparison"""
+
+    def __init__(self, act, place, start_obj, stop_obj, info=''):
+        self.act = act
+        self.place = place
+        self.start = start_obj
+        self.stop = stop_obj
+        self.info = info
+
+
+class DictElement:
+    """SnappyElement as it was before __slots__, keeping every style property"""
+
+    def __init__(self, dict_):
+        self.text = dict_['text']
+        self.coords = {'x': dict_['x'], 'y': dict_['y']}
+        self.style = dict(
+            item.split(':', 1) for item in dict_['style'].split(';') if ':' in item
+        )
+
+
+def event_tuples(events):
+    return [(event.act, event.place, event.start, event.stop, event.info) for event in events]
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def layout(sizes):
+    """Parse synthetic weeks with the old scan and with LayoutIndex, check they agree and print the speedup"""
+
+    dt = JsonDateTime(YEAR, 1, 1)
+    for lessons_per_day in sizes:
+        driver = fixtures.ReplayDriver(fixtures.synthetic(lessons_per_day))
+        elements = sum(len(dicts) for dicts in driver.payload.values())
+        # the old scan is slow enough that one run is plenty on big pages
+        scan_seconds, (scanned, _) = best_of(lambda: Schedule.parse(driver, dt, scan_boxes), 1 if elements > 2000 else 3)
+        index_seconds, (indexed, _) = best_of(lambda: Schedule.parse(driver, dt), 3)
+        if event_tuples(scanned) != event_tuples(indexed):
+            raise SystemExit(f'{lessons_per_day} lessons per day: the engines disagree')
+        print(f'{elements} elements, {len(indexed)} events: scan {scan_seconds * 1000:.1f}ms, '
+              f'index {index_seconds * 1000:.1f}ms, {scan_seconds / index_seconds:.1f}x')
+
+
+def storage_formats(count):
+    """Save and load a schedule of count events in every storage format, print the time taken and the file size"""
+
+    events = synthetic_events(count)
+    days = sorted({JsonDateTime(*event.start.timetuple()[:3]) for event in events})
+    schedule = Schedule(events, JsonDateTime(YEAR, 1, 1), days)
+    formats = ['json', 'jsonl']
+    try:
+        storage.import_msgpack()
+        formats.append('msgpack')
+    except ImportError:
+        print('msgpack is not installed, skipping .msgpack')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for format_ in formats:
+            path = os.path.join(directory, f'schedule.{format_}')
+            save_seconds, _ = best_of(lambda: storage.save(schedule, path), 3)
+            load_seconds, loaded = best_of(lambda: storage.load(path), 3)
+            if event_tuples(loaded) != event_tuples(events):
+                raise SystemExit(f'.{format_}: the loaded events differ from the saved ones')
+            print(f'.{format_}: {count} events, save {save_seconds * 1000:.0f}ms, load {load_seconds * 1000:.0f}ms, '
+                  f'{os.path.getsize(path) / 1e6:.1f}MB')
+
+
+def strftime_csv(events, file):
+    """How Schedule.save_csv wrote csv before export.py, four strftime calls per event"""
+
+    writer = csv.writer(file)
+    writer.writerow(export.CSV_HEADER)
+    for act in events:
+        start_time = act.start.strftime('%I:%M %p').upper()
+        end_time = act.stop.strftime('%I:%M %p').upper()
+        writer.writerow([
+            act.act,
+            act.start.strftime('%m/%d/%Y'),
+            start_time[1:] if start_time[0] == '0' else start_time,
+            act.stop.strftime('%m/%d/%Y'),
+            end_time[1:] if end_time[0] == '0' else end_time,
+            act.place
+        ])
+
+
+def cold_export(events, path):
+    # every run starts without formatted datetimes, like a fresh process would
+    export.csv_datetime.cache_clear()
+    export.ics_datetime.cache_clear()
+    export.export(events, path)
+
+
+def exports(count):
+    """Export count events as csv with the old writer and export.py, and as ics, print the time taken and size"""
+
+    events = synthetic_events(count)
+    old = io.StringIO(newline='')
+    old_seconds, _ = best_of(lambda: strftime_csv(events, old), 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for format_ in export.WRITERS:
+            path = os.path.join(directory, f'schedule.{format_}')
+            seconds, _ = best_of(lambda: cold_export(events, path), 3)
+            print(f'.{format_}: {count} events, {seconds * 1000:.0f}ms, {os.path.getsize(path) / 1e6:.1f}MB')
+            if format_ == 'csv':
+                with open(path, 'r', encoding='utf-8', newline='') as file:
+                    if file.read() != old.getvalue():
+                        raise SystemExit('the csv differs from the old writer\'s')
+                print(f'old csv writer: {old_seconds * 1000:.0f}ms, same output')
+
+
+def messy_events(count, seed=0):
+    """
+    count events like a careless scrape: shuffled, about 10% scraped twice and 5% split in two back to back blocks,
+    lessons are 50 or 70 minutes, so some overlap the next one
+    """
+
+    rand = random.Random(seed)
+    events = []
+    for event in synthetic_events(count):
+        stop = event.start + timedelta(minutes=rand.choice((50, 50, 50, 50, 70)))
+        event = Event(event.act, event.place, event.start, stop, event.info)
+        if rand.random() < 0.05:
+            middle = event.start + timedelta(minutes=25)
+            events += [
+                Event(event.act, event.place, event.start, middle, event.info),
+                Event(event.act, event.place, middle, event.stop, event.info)
+            ]
+        else:
+            events.append(event)
+        if rand.random() < 0.1:
+            events.append(events[-1])
+    rand.shuffle(events)
+    return events[:count]
+
+
+def brute_force_overlaps(events):
+    return sum(
+        1
+        for idx, event in enumerate(events)
+        for other in events[idx + 1:]
+        if event.start < other.stop and other.start < event.stop
+    )
+
+
+def normalize(sizes):
+    """Time Normalized.from_events and check its overlaps against comparing every pair on a small schedule"""
+
+    small = Normalized.from_events(messy_events(600))
+    if brute_force_overlaps(small.events) != len(small.overlaps):
+        raise SystemExit('the overlaps differ from a pairwise check')
+    for count in sizes:
+        events = messy_events(count)
+        seconds, normalized = best_of(lambda: Normalized.from_events(events), 3)
+        peak, _ = traced_peak(lambda: Normalized.from_events(events))
+        print(f'{count} events: {seconds * 1000:.0f}ms, {peak / 1e6:.1f}MB peak, {normalized}')
+
+
+def traced_peak(func):
+    """Return (peak bytes allocated while func ran, its result)"""
+
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+def traced(func):
+    """Return (bytes held by what func returns, its result)"""
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def memory(events_count, elements_count):
+    """Print the memory held by events_count events and elements_count page elements in each representation"""
+
+    # each is built from fresh events, so the strings and datetimes they hold on to are counted too
+    representations = [
+        ('dict-backed Events', lambda: [
+            DictEvent(event.act, event.place, event.start, event.stop, event.info)
+            for event in synthetic_events(events_count)
+        ]),
+        ('slotted Events', lambda: synthetic_events(events_count)),
+        ('EventTable', lambda: EventTable(synthetic_events(events_count)))
+    ]
+    for name, func in representations:
+        size, _ = traced(func)
+        print(f'{events_count} events as {name}: {size / 1e6:.1f}MB')
+
+    # a big enough synthetic page, textboxes and boxes like parse reads them
+    payload = fixtures.synthetic(elements_count // 5 // 3 + 1)
+    dicts = (payload['textBox'] + payload['box'])[:elements_count]
+    for name, func in [
+        ('dict-backed elements', lambda: [DictElement(dict_) for dict_ in dicts]),
+        ('SnappyElements', lambda: [SnappyElement.from_dict(dict_) for dict_ in dicts])
+    ]:
+        size, _ = traced(func)
+        print(f'{len(dicts)} {name}: {size / 1e6:.1f}MB')
+
+
+def main(args):
+    if not args:
+        raise SystemExit(__doc__)
+    command, numbers = args[0], [int(arg) for arg in args[1:]]
+    if command == 'layout':
+        layout(numbers or [8, 100, 400, 1000])
+    elif command == 'storage':
+        storage_formats(*numbers or [EVENTS])
+    elif command == 'normalize':
+        normalize(numbers or [1000, 10000, EVENTS])
+    elif command == 'export':
+        exports(*numbers or [EVENTS])
+    elif command == 'memory':
+        memory(*(numbers + [EVENTS, ELEMENTS][len(numbers):]))
+    else:
+        raise SystemExit(__doc__)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
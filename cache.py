@@ -0,0 +1,93 @@
+"""Small on-disk caches with ttl, so repeat runs can skip network calls"""
+
+from googleapiclient.discovery_cache.base import Cache
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+CACHE_DIR = '.cache'
+DAY = 24 * 60 * 60
+
+
+class FileCache:
+    """json file of key -> value, entries older than ttl seconds are ignored"""
+
+    def __init__(self, path, ttl=DAY):
+        self.path = path
+        self.ttl = ttl
+        self.entries = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        write_file(self.path, json.dumps(self.entries))
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry['time'] > self.ttl:
+            return default
+        return entry['value']
+
+    def set(self, key, value):
+        self.entries[key] = {'value': value, 'time': time.time()}
+        self.save()
+
+    def delete(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.save()
+
+
+class DiscoveryCache(Cache):
+    """Discovery documents for googleapiclient's build, one file per url"""
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, 'discovery'), ttl=7 * DAY):
+        self.directory = directory
+        self.ttl = ttl
+
+    def file_path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        path = self.file_path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'r') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def set(self, url, content):
+        write_file(self.file_path(url), content)
+
+
+def write_file(path, content):
+    """
+    Write content to a temporary file next to path and rename it over path,
+    the temporary file's name is unique so processes saving the same cache at once don't write into each other
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with open(fd, 'w') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def calendar_ids():
+    """calendar summary -> id"""
+
+    return FileCache(os.path.join(CACHE_DIR, 'calendars.json'), ttl=7 * DAY)
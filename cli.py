@@ -0,0 +1,183 @@
+"""
+Command line entry point
+
+    python cli.py scrape [--config config.json] [--workers 4] [--output schedule.jsonl]
+    python cli.py watch config.json
+    python cli.py sync [schedule.jsonl] [--calendar schedule_migrater] [--dry-run] [--reconcile]
+    python cli.py fanout fanout.json [--workers 4]
+    python cli.py export schedule.jsonl schedule.ics [--raw]
+    python cli.py diff old.jsonl new.jsonl
+    python cli.py check-startup
+
+each subcommand imports what it needs when it runs,
+so selenium and the google api client are only loaded by the subcommands that use them
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# modules that must not be imported just to start the cli or to export
+HEAVY_MODULES = ('selenium', 'googleapiclient', 'apiclient', 'google_auth_oauthlib', 'rich', 'numpy', 'requests')
+STARTUP_BUDGET_MS = 150
+
+
+def scrape(args):
+    if args.config is None:
+        import scraper
+        from getpass import getpass
+
+        scraper.main(input('username: '), getpass('password: '), args.output)
+    elif args.workers > 1:
+        import pool
+        pool.main(args.config, args.workers)
+    else:
+        import batch
+        batch.main(args.config)
+
+
+def watch(args):
+    import daemon
+    daemon.main(args.config)
+
+
+def fanout(args):
+    import fanout
+    fanout.main(args.config, args.workers)
+
+
+def sync(args):
+    import sync
+    sync.sync_file(args.path, args.calendar, args.dry_run, args.reconcile)
+
+
+def export(args):
+    import storage
+    import export
+    from normalize import Normalized
+
+    events = storage.iter_events(args.path)
+    if not args.raw:
+        # files saved before normalize.py existed can have duplicates, like in sync_file
+        events = Normalized.from_events(events).events
+    export.export(events, args.output, args.format)
+
+
+def diff(args):
+    import storage
+
+    old = {event.key: event for event in storage.iter_events(args.old)}
+    new = {event.key: event for event in storage.iter_events(args.new)}
+    old_slots = {event.slot: key for key, event in old.items() if key not in new}
+    new_slots = {event.slot: key for key, event in new.items() if key not in old}
+
+    changed = old_slots.keys() & new_slots.keys()
+    for slot in sorted(old_slots.keys() - changed):
+        print(f'- {slot}')
+    for slot in sorted(new_slots.keys() - changed):
+        print(f'+ {slot}')
+    for slot in sorted(changed):
+        before, after = old[old_slots[slot]], new[new_slots[slot]]
+        print(f'~ {slot}: {before.place!r} -> {after.place!r}, {before.info!r} -> {after.info!r}')
+    print(f'{len(old_slots) - len(changed)} removed, {len(new_slots) - len(changed)} added, {len(changed)} changed')
+
+
+def check_startup(args):
+    """Import the cli and the export path with -X importtime, fail if heavy modules load or it's too slow"""
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import cli, storage, export'],
+        cwd=directory,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    if result.returncode:
+        print(result.stderr)
+        return result.returncode
+
+    # lines look like: import time:  self [us] | cumulative | imported package
+    imported = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)', line)
+        if not match:
+            continue
+        self_us, _, indent, name = match.groups()
+        total_us += int(self_us)
+        imported.append(name)
+
+    heavy = sorted({name for name in imported if name.split('.')[0] in HEAVY_MODULES})
+    print(f'{len(imported)} modules imported in {total_us / 1000:.1f}ms (budget {args.budget_ms}ms)')
+    if heavy:
+        print('heavy modules imported at startup: ' + ', '.join(heavy))
+        return 1
+    if total_us / 1000 > args.budget_ms:
+        print('startup is over budget')
+        return 1
+    return 0
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='schedule_migrater', description='copy Skola24 schedules to google calendar')
+    parser.add_argument('--trace', help='write a chrome trace of the run to this path')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    parser_scrape = subparsers.add_parser('scrape', help='scrape schedules from Skola24')
+    parser_scrape.add_argument('--config', help='batch config, see batch.py, asks interactively without one')
+    parser_scrape.add_argument('--workers', type=int, default=1, help='browsers to scrape the config with')
+    parser_scrape.add_argument('--output', default='schedule.jsonl', help='where the interactive scrape is saved')
+    parser_scrape.set_defaults(func=scrape)
+
+    parser_watch = subparsers.add_parser('watch', help='keep polling the config and syncing the weeks that change')
+    parser_watch.add_argument('config', help='batch config, see batch.py and daemon.py')
+    parser_watch.set_defaults(func=watch)
+
+    parser_sync = subparsers.add_parser('sync', help='sync a saved schedule to google calendar')
+    parser_sync.add_argument('path', nargs='?', default='schedule.jsonl')
+    parser_sync.add_argument('--calendar', default='schedule_migrater', help='summary of the calendar')
+    parser_sync.add_argument('--dry-run', action='store_true', help='only print what would change')
+    parser_sync.add_argument('--reconcile', action='store_true', help='list the calendar instead of trusting the local state')
+    parser_sync.set_defaults(func=sync)
+
+    parser_fanout = subparsers.add_parser('fanout', help='sync saved schedules to many calendars')
+    parser_fanout.add_argument('config', help='fan out config, see fanout.py')
+    parser_fanout.add_argument('--workers', type=int, default=4)
+    parser_fanout.set_defaults(func=fanout)
+
+    parser_export = subparsers.add_parser('export', help='export a saved schedule to csv or ics')
+    parser_export.add_argument('path')
+    parser_export.add_argument('output')
+    parser_export.add_argument('--format', choices=('csv', 'ics'), help='picked from the output extension by default')
+    parser_export.add_argument(
+        '--raw', action='store_true', help='stream the events as saved, without sorting, de-duplicating or merging them'
+    )
+    parser_export.set_defaults(func=export)
+
+    parser_diff = subparsers.add_parser('diff', help='compare two saved schedules')
+    parser_diff.add_argument('old')
+    parser_diff.add_argument('new')
+    parser_diff.set_defaults(func=diff)
+
+    parser_check = subparsers.add_parser('check-startup', help='check that startup stays light')
+    parser_check.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS)
+    parser_check.set_defaults(func=check_startup)
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    try:
+        code = args.func(args)
+    finally:
+        # timings are printed even when the command fails
+        import instrument
+        instrument.report(args.trace)
+    return code or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
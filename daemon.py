@@ -0,0 +1,267 @@
+"""
+Keep the calendar in sync with Skola24 without running anything by hand
+one browser stays logged in between polls, and logs in again when the session runs out,
+every week of the config is polled on its own interval, which doubles each time the week hasn't changed,
+and only weeks whose page changed are parsed and synced
+
+Usage: python daemon.py config.json, the config is the same as for batch.py, with optional
+    "calendar": "schedule_migrater",
+    "cache": ".cache/weeks.json",
+    "state": ".cache/state.sqlite3",
+    "min interval": 300,
+    "max interval": 21600,
+    "health port": 8765
+GET http://127.0.0.1:8765/health returns the daemon's state as json, /metrics the counters and timings as text
+"""
+
+from scraper import Schedule
+from JsonDateTime import JsonDateTime
+from batch import load_config, get_password
+from gcal import load_credentials, get_service, get_cal_id, print_errors
+from weekcache import WeekCache
+from state import StateStore, STATE_PATH
+from instrument import count, snapshot
+import sync
+
+from selenium.common.exceptions import WebDriverException
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 6 * 60 * 60
+HEALTH_PORT = 8765
+CACHE_PATH = os.path.join('.cache', 'weeks.json')
+# chrome grows over days of page loads, so the browser is replaced after this many
+BROWSER_MAX_PAGES = 500
+
+
+class WeekPoll:
+    def __init__(self, target, week, min_interval, max_interval):
+        self.target = target
+        self.week = week
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.due = 0
+
+    def __str__(self):
+        return f'{self.target.sche_type} {self.target.schedule_id} week {self.week}'
+
+    def __lt__(self, other):
+        return self.due < other.due
+
+    def changed(self, now):
+        self.interval = self.min_interval
+        self.due = now + self.interval
+
+    def unchanged(self, now):
+        """Weeks that rarely change are polled less and less often, down to once every max_interval"""
+
+        self.interval = min(self.interval * 2, self.max_interval)
+        self.due = now + self.interval
+
+    def failed(self, now):
+        self.due = now + self.min_interval
+
+
+class Daemon:
+    def __init__(self, config, password, credentials):
+        self.config = config
+        self.password = password
+        self.service = get_service(credentials)
+        self.calendar_id = get_cal_id(self.service, config.get('calendar', 'schedule_migrater'))
+        self.cache = WeekCache(config.get('cache', CACHE_PATH))
+        self.store = StateStore(config.get('state', STATE_PATH))
+        self.browser = None
+        self.pages = 0
+
+        min_interval = config.get('min interval', MIN_INTERVAL)
+        max_interval = config.get('max interval', MAX_INTERVAL)
+        self.polls = [
+            WeekPoll(target, week, min_interval, max_interval)
+            for target in config['targets']
+            for week in target.weeks
+        ]
+        heapq.heapify(self.polls)
+
+        self.started = time.time()
+        self.last_poll = None
+        self.last_change = None
+        self.last_error = None
+        self.failing = False
+        self.stopping = threading.Event()
+
+    def start_browser(self):
+        self.close_browser()
+        self.browser = Schedule.start_browser(self.config.get('headless', True))
+        Schedule.login(self.browser, self.config['username'], self.password)
+        self.pages = 0
+        count('logins')
+
+    def close_browser(self):
+        if self.browser is not None:
+            try:
+                self.browser.quit()
+            except WebDriverException:
+                pass
+            self.browser = None
+
+    def scrape(self, poll, dt):
+        """
+        Return (events, days updated, changes) of poll's week, days updated is empty if the page hasn't changed
+        changes go in the cache once the week is synced, see Schedule.get_changed_weeks
+        """
+
+        if self.browser is None or self.pages >= BROWSER_MAX_PAGES:
+            self.start_browser()
+        target = poll.target
+        args = (target.school, target.sche_type, target.schedule_id, [poll.week], dt, self.cache)
+        self.pages += 1
+        try:
+            return Schedule.get_changed_weeks(self.browser, *args)
+        except WebDriverException:
+            # most likely the session ran out and the page is the login form, log in again and retry once
+            count('relogins')
+            self.start_browser()
+            self.pages += 1
+            return Schedule.get_changed_weeks(self.browser, *args)
+
+    def push(self, poll, events, days_updated):
+        self.calendar_id, plan, errors = sync.sync_events(
+            self.service, self.store, self.config.get('calendar', 'schedule_migrater'), self.calendar_id,
+            events, days_updated
+        )
+        print(f'{poll}: {plan}')
+        print_errors(errors, f'{poll}:')
+        return errors
+
+    def poll(self):
+        """Poll the week that is due first"""
+
+        poll = heapq.heappop(self.polls)
+        now = time.time()
+        try:
+            events, days_updated, changes = self.scrape(poll, JsonDateTime.now())
+            if days_updated:
+                if not self.push(poll, events, days_updated):
+                    # a week with failed calls isn't cached, so the next poll syncs it again
+                    for change in changes:
+                        self.cache.put(*change)
+                    self.cache.save()
+                poll.changed(now)
+                self.last_change = now
+                count('weeks changed')
+            else:
+                poll.unchanged(now)
+                count('weeks unchanged')
+            self.failing = False
+        except Exception as error:
+            # keep polling the other weeks, this one is tried again after min interval
+            poll.failed(now)
+            self.failing = True
+            self.last_error = f'{poll}: {error}'
+            count('failed polls')
+            print(f'{poll}: poll failed: {error}')
+        finally:
+            heapq.heappush(self.polls, poll)
+            self.last_poll = now
+
+    def run(self):
+        try:
+            while not self.stopping.is_set():
+                # sleeping on the event lets stop() interrupt the wait
+                wait = self.polls[0].due - time.time()
+                if wait > 0 and self.stopping.wait(wait):
+                    break
+                self.poll()
+        finally:
+            self.close_browser()
+            self.cache.save()
+            self.store.close()
+
+    def stop(self):
+        self.stopping.set()
+
+    def health(self):
+        return {
+            'status': 'error' if self.failing else 'ok',
+            'uptime': round(time.time() - self.started),
+            'last poll': self.last_poll,
+            'last change': self.last_change,
+            'last error': self.last_error,
+            'weeks': len(self.polls),
+            'next poll': min((poll.due for poll in list(self.polls)), default=None),
+            'browser pages': self.pages
+        }
+
+    @staticmethod
+    def metrics():
+        """Counters and phase timings in prometheus' text format"""
+
+        phases, counters, api_calls = snapshot()
+        lines = []
+        for name, value in sorted(counters.items()):
+            lines.append(f'schedule_migrater_{metric_name(name)}_total {value}')
+        for name, (calls, total) in sorted(phases.items()):
+            lines.append(f'schedule_migrater_{metric_name(name)}_seconds_total {total:.3f}')
+            lines.append(f'schedule_migrater_{metric_name(name)}_calls_total {calls}')
+        for kind, (calls, _) in sorted(api_calls.items()):
+            lines.append(f'schedule_migrater_api_calls_total{{kind="{kind}"}} {calls}')
+        return '\n'.join(lines) + '\n'
+
+    def serve_health(self, port=None):
+        """Serve /health and /metrics on localhost in a background thread, return the server"""
+
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/health':
+                    body = json.dumps(daemon.health()).encode('utf-8')
+                    content_type = 'application/json'
+                elif self.path == '/metrics':
+                    body = daemon.metrics().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        port = port or self.config.get('health port', HEALTH_PORT)
+        server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=server.serve_forever, name='health', daemon=True).start()
+        return server
+
+
+def metric_name(name):
+    return ''.join(char if char.isalnum() else '_' for char in name.lower())
+
+
+def main(config_path):
+    config = load_config(config_path)
+    daemon = Daemon(config, get_password(), load_credentials())
+    server = daemon.serve_health()
+    print(f'watching {len(daemon.polls)} weeks, health on http://127.0.0.1:{server.server_port}/health')
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,154 @@
+"""
+Streaming exporters for schedules
+the writers take any iterable of Event and any text file object, so nothing has to be held in memory,
+datetimes are formatted once per unique timestamp
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+import csv
+import hashlib
+import os
+import secrets
+
+CSV_HEADER = ['Subject', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Location']
+
+TIMEZONE = 'Europe/Stockholm'
+# rules for TIMEZONE since 1996, ics files have to define the timezones they use
+VTIMEZONE = (
+    'BEGIN:VTIMEZONE',
+    f'TZID:{TIMEZONE}',
+    'BEGIN:DAYLIGHT',
+    'TZOFFSETFROM:+0100',
+    'TZOFFSETTO:+0200',
+    'TZNAME:CEST',
+    'DTSTART:19700329T020000',
+    'RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU',
+    'END:DAYLIGHT',
+    'BEGIN:STANDARD',
+    'TZOFFSETFROM:+0200',
+    'TZOFFSETTO:+0100',
+    'TZNAME:CET',
+    'DTSTART:19701025T030000',
+    'RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU',
+    'END:STANDARD',
+    'END:VTIMEZONE',
+)
+
+
+@contextmanager
+def atomic_write(path, newline=None):
+    """Open a temporary file next to path, and rename it to path if the block doesn't raise"""
+
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f'.{os.path.basename(path)}.{secrets.token_hex(8)}.tmp')
+    # O_EXCL so the file is only ours, and the umask applies to 0o666 like it does for open
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with open(fd, 'w', encoding='utf-8', newline=newline) as file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+@lru_cache(maxsize=4096)
+def csv_datetime(dt):
+    """Return ('mm/dd/yyyy', 'h:mm AM') like google calendar's csv import wants"""
+
+    hour = dt.hour % 12 or 12
+    suffix = 'AM' if dt.hour < 12 else 'PM'
+    return f'{dt.month:02d}/{dt.day:02d}/{dt.year}', f'{hour}:{dt.minute:02d} {suffix}'
+
+
+def write_csv(events, file):
+    """Write events to file as csv, for google calendar's import instead of using the api"""
+
+    writer = csv.writer(file)
+    writer.writerow(CSV_HEADER)
+    for act in events:
+        start_date, start_time = csv_datetime(act.start)
+        end_date, end_time = csv_datetime(act.stop)
+        writer.writerow([act.act, start_date, start_time, end_date, end_time, act.place])
+
+
+@lru_cache(maxsize=4096)
+def ics_datetime(dt):
+    return f'{dt.year:04d}{dt.month:02d}{dt.day:02d}T{dt.hour:02d}{dt.minute:02d}{dt.second:02d}'
+
+
+def ics_text(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ics_line(line):
+    """Fold line at 75 octets, as the ics format wants"""
+
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # don't cut inside a multi byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def ics_uid(act):
+    """
+    Uid from the lesson's slot, start, stop and title, like sync matches lessons by,
+    so a calendar that imports the file again updates a lesson whose room or info changed instead of adding it
+    """
+
+    return hashlib.sha1(act.slot.encode('utf-8')).hexdigest() + '@schedule_migrater'
+
+
+def write_ics(events, file, name='schedule_migrater'):
+    """Write events to file as an iCalendar file"""
+
+    stamp = ics_datetime(datetime.utcnow()) + 'Z'
+    file.write(''.join(map(ics_line, (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//schedule_migrater//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{ics_text(name)}',
+        f'X-WR-TIMEZONE:{TIMEZONE}',
+    ) + VTIMEZONE)))
+    for act in events:
+        file.write(''.join(map(ics_line, (
+            'BEGIN:VEVENT',
+            f'UID:{ics_uid(act)}',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;TZID={TIMEZONE}:{ics_datetime(act.start)}',
+            f'DTEND;TZID={TIMEZONE}:{ics_datetime(act.stop)}',
+            f'SUMMARY:{ics_text(act.act)}',
+            f'LOCATION:{ics_text(act.place)}',
+            f'DESCRIPTION:{ics_text(act.info)}',
+            'END:VEVENT',
+        ))))
+    file.write(ics_line('END:VCALENDAR'))
+
+
+WRITERS = {
+    'csv': write_csv,
+    'ics': write_ics,
+}
+
+
+def export(events, path, format_=None):
+    """Write events to path, the format is picked from the extension if not given"""
+
+    format_ = format_ or os.path.splitext(path)[1].lstrip('.')
+    if format_ not in WRITERS:
+        raise ValueError(f'unknown export format: {format_}')
+    # csv does its own line endings, ics lines already end in \r\n
+    with atomic_write(path, newline='') as file:
+        WRITERS[format_](events, file)
@@ -0,0 +1,239 @@
+"""
+Sync saved schedules to many calendars at once, e.g. one per student or teacher
+each (calendar, week) is a job, jobs run on a bounded pool of workers, nearest weeks first,
+and every request waits for a token from its user's bucket and the project's bucket,
+so the api's quotas aren't hit instead of being hit and backed off from
+
+The config is a json file:
+{
+    "project rate": 10,
+    "user rate": 5,
+    "destinations": [
+        {"calendar": "7A Anna", "schedule": "class_7A.jsonl"},
+        {"calendar": "Teacher AB", "schedule": "teacher_AB.jsonl", "user": "ab"}
+    ]
+}
+"user" picks the token bucket a destination shares, destinations without one share the default bucket,
+since every request is made with the same credentials
+
+Usage: python fanout.py config.json [workers]
+"""
+
+from gcal import load_credentials, get_service, get_cal_ids, print_errors, is_rate_limit, MAX_RETRIES
+from state import StateStore, STATE_PATH
+from instrument import count, timer
+import storage
+import sync
+
+from datetime import date, timedelta
+from queue import PriorityQueue, Empty
+import itertools
+import json
+import sys
+import threading
+import time
+
+WORKERS = 4
+# requests per second, below the calendar api's default quotas, raise them if the project has more
+PROJECT_RATE = 10
+USER_RATE = 5
+DEFAULT_USER = 'default'
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        """
+        :param rate: float, tokens added per second
+        :param capacity: float, most tokens that can be saved up, rate by default (one second of burst)
+        """
+
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self, n=1):
+        """
+        Take n tokens and return how many seconds to wait before using them
+        tokens can go below zero, so callers are served in order and n can be more than capacity
+        """
+
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= n
+            return max(0, -self.tokens / self.rate)
+
+
+class Quota:
+    """One bucket for the project and one per user, a request needs a token from both"""
+
+    def __init__(self, project_rate=PROJECT_RATE, user_rate=USER_RATE, sleep=time.sleep, clock=time.monotonic):
+        self.project = TokenBucket(project_rate, clock=clock)
+        self.user_rate = user_rate
+        self.users = {}
+        self.lock = threading.Lock()
+        self.sleep = sleep
+        self.clock = clock
+
+    def user(self, user):
+        with self.lock:
+            if user not in self.users:
+                self.users[user] = TokenBucket(self.user_rate, clock=self.clock)
+            return self.users[user]
+
+    def acquire(self, user, n=1):
+        wait = max(self.user(user).reserve(n), self.project.reserve(n))
+        if wait:
+            count('throttled requests', n)
+            self.sleep(wait)
+
+    def throttle(self, user):
+        """Return a function for execute_batch's throttle"""
+
+        return lambda n: self.acquire(user, n)
+
+
+class SyncJob:
+    def __init__(self, priority, summary, user, monday, events, days_updated):
+        self.priority = priority
+        self.summary = summary
+        self.user = user
+        self.monday = monday
+        self.events = events
+        self.days_updated = days_updated
+        self.attempts = 0
+
+    def __str__(self):
+        return f'{self.summary} week {self.monday.isocalendar()[1]}'
+
+    @staticmethod
+    def week_priority(monday, today):
+        """Upcoming weeks first, nearest first, then past weeks, most recent first"""
+
+        this_monday = today - timedelta(days=today.weekday())
+        return (monday < this_monday, abs((monday - this_monday).days))
+
+
+class FanOut:
+    def __init__(self, make_service, workers=WORKERS, quota=None, state_path=STATE_PATH, cal_ids=None):
+        """
+        :param make_service: function returning a calendar service, called once per worker,
+            since googleapiclient isn't thread safe
+        :param cal_ids: passed on to get_cal_ids
+        """
+
+        self.make_service = make_service
+        self.workers = workers
+        self.quota = quota or Quota()
+        self.state_path = state_path
+        self.cal_ids = cal_ids
+        self.jobs = PriorityQueue()
+        self.order = itertools.count()
+        self.calendar_ids = {}
+        self.errors = []
+        self.done = 0
+        self.lock = threading.Lock()
+
+    def add(self, summary, events, days_updated, user=DEFAULT_USER, today=None):
+        """Queue a schedule for the calendar with summary, one job per week"""
+
+        today = today or date.today()
+        weeks = {}
+        for day in days_updated:
+            monday = day.date() - timedelta(days=day.weekday())
+            weeks.setdefault(monday, ([], []))[1].append(day)
+        for event in events:
+            monday = event.start.date() - timedelta(days=event.start.weekday())
+            if monday in weeks:
+                weeks[monday][0].append(event)
+
+        for monday, (week_events, week_days) in weeks.items():
+            job = SyncJob(SyncJob.week_priority(monday, today), summary, user, monday, week_events, week_days)
+            # the counter keeps jobs of equal priority in the order they were added
+            self.jobs.put((job.priority, next(self.order), job))
+        self.calendar_ids.setdefault(summary, None)
+
+    def resolve_calendars(self, service):
+        self.quota.acquire(DEFAULT_USER)
+        self.calendar_ids.update(get_cal_ids(service, list(self.calendar_ids), self.cal_ids))
+
+    def worker(self):
+        service = self.make_service()
+        with StateStore(self.state_path) as store:
+            while True:
+                try:
+                    _, _, job = self.jobs.get_nowait()
+                except Empty:
+                    break
+                job.attempts += 1
+                try:
+                    self.run_job(service, store, job)
+                except Exception as error:
+                    if is_rate_limit(error) and job.attempts <= MAX_RETRIES:
+                        count('retried jobs')
+                        self.jobs.put((job.priority, next(self.order), job))
+                        continue
+                    # one failed job shouldn't stop the others
+                    with self.lock:
+                        self.errors.append((str(job), error))
+                finally:
+                    self.jobs.task_done()
+
+    def run_job(self, service, store, job):
+        calendar_id = self.calendar_ids[job.summary]
+        self.quota.acquire(job.user)
+        calendar_id, plan, errors = sync.sync_events(
+            service, store, job.summary, calendar_id, job.events, job.days_updated,
+            throttle=self.quota.throttle(job.user), cal_ids=self.cal_ids
+        )
+        self.calendar_ids[job.summary] = calendar_id
+        count('sync jobs')
+        with self.lock:
+            self.done += 1
+            self.errors += [(f'{job}: {description}', error) for description, error in errors]
+
+    def run(self):
+        """Run every queued job, return errors as (description, error)"""
+
+        self.resolve_calendars(self.make_service())
+        threads = [
+            threading.Thread(target=self.worker, name=f'fanout {idx}', daemon=True)
+            for idx in range(min(self.workers, self.jobs.qsize()))
+        ]
+        with timer('fan out'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return self.errors
+
+
+def main(config_path, workers=WORKERS):
+    with open(config_path, 'r') as file:
+        config = json.load(file)
+    credentials = load_credentials()
+    fan_out = FanOut(
+        lambda: get_service(credentials),
+        workers,
+        Quota(config.get('project rate', PROJECT_RATE), config.get('user rate', USER_RATE))
+    )
+    schedules = {}
+    for destination in config['destinations']:
+        path = destination['schedule']
+        if path not in schedules:
+            schedules[path] = storage.load(path)
+        schedule = schedules[path]
+        fan_out.add(destination['calendar'], schedule, schedule.days_updated, destination.get('user', DEFAULT_USER))
+
+    start = time.perf_counter()
+    errors = fan_out.run()
+    print(f'{fan_out.done} weeks synced to {len(fan_out.calendar_ids)} calendars in {time.perf_counter() - start:.1f}s')
+    print_errors(errors, 'job')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], *map(int, sys.argv[2:3]))
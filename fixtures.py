@@ -0,0 +1,232 @@
+"""
+Record a week's timetable elements to a file and replay them into Schedule.parse without a browser
+
+Usage:
+    python fixtures.py record config.json directory     records every target week in a batch.py config
+    python fixtures.py synthetic fixture.json [lessons per day] [seed]   writes a synthetic week as a fixture
+    python fixtures.py bench fixture.json [scale ...]   times parse on a fixture, scaled up by each factor
+"""
+
+from scraper import Schedule, SnappyElement
+from JsonDateTime import JsonDateTime
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+CLASS_NAMES = ('textBox', 'box')
+# boxes before this index are the page frame and the day headers, see Schedule.parse_elements
+HEADER_BOXES = 7
+
+DAY_NAMES = ('Måndag', 'Tisdag', 'Onsdag', 'Torsdag', 'Fredag')
+DAY_WIDTH = 200
+LESSON_COLORS = ((120, 200, 80), (80, 120, 200), (200, 80, 120))
+# the year synthetic weeks are saved with, their monday defaults to 17/8, a monday that year
+SYNTHETIC_YEAR = 2026
+
+
+class ReplayElement:
+    """Stands in for a selenium WebElement"""
+
+    def __init__(self, dict_):
+        self.text = dict_['text']
+        self.location = {'x': dict_['x'], 'y': dict_['y']}
+        self.style = dict_['style']
+
+    def get_attribute(self, attribute):
+        if attribute != 'style':
+            raise KeyError(attribute)
+        return self.style
+
+
+class ReplayDriver:
+    """Stands in for a selenium WebDriver, serves a recorded snapshot to Schedule.parse"""
+
+    def __init__(self, payload, script=True):
+        """
+        :param payload: dict, class name -> list of element dicts, from record or load
+        :param script: bool, False makes execute_script fail, so parse takes the per element path
+        """
+
+        self.payload = payload
+        self.script = script
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load(path)['elements'])
+
+    def execute_script(self, script, class_names):
+        if not self.script:
+            raise TypeError('execute_script is turned off')
+        return json.dumps({class_name: self.payload.get(class_name, []) for class_name in class_names})
+
+    def find_elements_by_class_name(self, class_name):
+        return [ReplayElement(dict_) for dict_ in self.payload.get(class_name, [])]
+
+
+def record(selenium, path, dt=None):
+    """Save the elements of the week shown in selenium to path"""
+
+    dt = dt or JsonDateTime.now()
+    save(path, SnappyElement.raw_snapshot(selenium, CLASS_NAMES), dt.year)
+
+
+def save(path, payload, year):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'year': year, 'elements': payload}, file, ensure_ascii=False)
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def scale(payload, factor):
+    """
+    Return a copy of payload with the lessons repeated factor times below each other
+    the page frame and day headers are kept once, so the copy still parses
+    """
+
+    textboxes = payload['textBox']
+    boxes = payload['box']
+    header_textboxes = [element for element in textboxes if '/' in element['text'] and 'dag' in element['text']]
+    body_textboxes = [element for element in textboxes if element not in header_textboxes]
+    body_boxes = boxes[HEADER_BOXES:]
+
+    elements = body_textboxes + body_boxes
+    if not elements:
+        return payload
+    height = max(element['y'] for element in elements) - min(element['y'] for element in elements) + 1
+
+    def tiled(elements):
+        return [
+            dict(element, y=element['y'] + copy * height)
+            for copy in range(factor)
+            for element in elements
+        ]
+
+    return {
+        'textBox': header_textboxes + tiled(body_textboxes),
+        'box': boxes[:HEADER_BOXES] + tiled(body_boxes)
+    }
+
+
+def style(width, height, color):
+    return f'width: {width}px; height: {height}px; background-color: rgb({color[0]}, {color[1]}, {color[2]})'
+
+
+def synthetic(lessons_per_day=8, seed=0, monday=(17, 8)):
+    """
+    Return a made up week laid out like the timetable viewer draws one, for benchmarks and tests
+    lessons are full or half width, have 0 to 3 attributes, and some are breaks in a non lesson color
+
+    :param lessons_per_day: int, about 5 textboxes and 1 box are made per lesson
+    :param monday: (day, month) of the week's monday, the days after it must be in the same month
+    """
+
+    rand = random.Random(seed)
+    headers = []
+    textboxes = []
+    boxes = [
+        {'text': '', 'x': 0, 'y': 0, 'style': style(1100, 1000, (0, 0, 0))},
+        {'text': '', 'x': 0, 'y': 0, 'style': style(1100, 40, (211, 211, 211))},
+    ]
+    day, month = monday
+    for idx, name in enumerate(DAY_NAMES):
+        x = 50 + idx * DAY_WIDTH
+        boxes.append({'text': '', 'x': x, 'y': 40, 'style': style(DAY_WIDTH, 40, (204, 204, 204))})
+        headers.append({'text': f'{name} {day + idx:02d}/{month}', 'x': x + 10, 'y': 45, 'style': ''})
+
+    for idx in range(len(DAY_NAMES)):
+        day_x = 50 + idx * DAY_WIDTH
+        y = 100
+        for lesson in range(lessons_per_day):
+            height = rand.choice((30, 45, 60, 90))
+            width = rand.choice((DAY_WIDTH - 2, DAY_WIDTH // 2 - 1))
+            x = day_x + 1 + (rand.choice((0, DAY_WIDTH // 2)) if width < DAY_WIDTH - 2 else 0)
+            color = rand.choice(LESSON_COLORS + ((204, 204, 204),))
+            boxes.append({'text': '', 'x': x, 'y': y, 'style': style(width, height, color)})
+
+            # minutes since 8:00 are the pixels below y 100, wrapped around midnight for long days
+            start = (480 + y - 100) % (24 * 60)
+            stop = (start + height) % (24 * 60)
+            textboxes.append({'text': f'{start // 60:02d}:{start % 60:02d}', 'x': x + 1, 'y': y - 3, 'style': ''})
+            textboxes.append({'text': f'{stop // 60:02d}:{stop % 60:02d}', 'x': x + width - 20, 'y': y + height - 5, 'style': ''})
+            for attribute in range(rand.choice((0, 1, 2, 3, 3))):
+                textboxes.append({
+                    'text': f'T{idx}{lesson}{attribute}',
+                    'x': x + 5 + attribute * 10,
+                    'y': y + 5 + attribute * 8,
+                    'style': ''
+                })
+            y += height + rand.choice((0, 0, 10, 20))
+
+    # the page doesn't list lessons in order, but the day headers come first
+    rand.shuffle(textboxes)
+    return {'textBox': headers + textboxes, 'box': boxes}
+
+
+def bench(payload, year, engine='python', repeat=5):
+    """Return (seconds per parse, bytes allocated per element, number of events)"""
+
+    dt = JsonDateTime(year, 1, 1)
+    driver = ReplayDriver(payload)
+    elements = sum(len(dicts) for dicts in payload.values())
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        events, _ = Schedule.parse(driver, dt, engine)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    Schedule.parse(driver, dt, engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / elements, len(events)
+
+
+def record_targets(config_path, directory):
+    from batch import load_config, get_password  # only needed for recording
+
+    config = load_config(config_path)
+    os.makedirs(directory, exist_ok=True)
+    browser = Schedule.start_browser(config.get('headless', True))
+    try:
+        Schedule.login(browser, config['username'], get_password())
+        for target in config['targets']:
+            for week in target.weeks:
+                Schedule.open_week(browser, target.school, target.sche_type, target.schedule_id, week)
+                name = f'{target.sche_type.replace(" ", "_")}_{target.schedule_id}_{week}.json'
+                record(browser, os.path.join(directory, name))
+                print(f'recorded {name}')
+    finally:
+        browser.quit()
+
+
+def main(args):
+    if args[0] == 'record':
+        record_targets(args[1], args[2])
+    elif args[0] == 'synthetic':
+        save(args[1], synthetic(*[int(arg) for arg in args[2:4]]), SYNTHETIC_YEAR)
+    elif args[0] == 'bench':
+        fixture = load(args[1])
+        for factor in [int(arg) for arg in args[2:]] or [1]:
+            payload = scale(fixture['elements'], factor)
+            elements = sum(len(dicts) for dicts in payload.values())
+            for engine in ('python', 'numpy'):
+                try:
+                    seconds, per_element, events = bench(payload, fixture['year'], engine)
+                except ImportError:
+                    continue
+                print(f'x{factor} {engine}: {elements} elements, {events} events, '
+                      f'{seconds * 1000:.1f}ms, {seconds / elements * 1e6:.2f}us and {per_element:.0f}B per element')
+    else:
+        raise SystemExit(__doc__)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,326 @@
+"""
+Google Calendar api helpers
+kept apart from google.py, which can't be imported by name since the google namespace package shadows it
+"""
+
+from apiclient.discovery import build
+from apiclient.errors import HttpError
+
+from cache import DiscoveryCache, calendar_ids
+from instrument import api_call, count, timed
+
+from datetime import date, timedelta
+import pickle
+import os
+import json
+import random
+import time
+
+# the calendar api accepts at most 50 calls in one batch request
+BATCH_SIZE = 50
+MAX_RETRIES = 5
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded')
+
+# private extended properties that link calendar events to scraped events
+KEY_PROPERTY = 'schedule_migrater_key'
+SLOT_PROPERTY = 'schedule_migrater_slot'
+
+# events().list returns at most 2500 events per page
+PAGE_SIZE = 2500
+ID_FIELDS = 'id,start'
+SYNC_FIELDS = 'id,etag,start,extendedProperties/private'
+
+
+def event_body(act_obj):
+    return {
+        'summary': act_obj.act,
+        'location': act_obj.place,
+        'description': act_obj.info,
+        'start': {
+            'dateTime': act_obj.start.strftime('%Y-%m-%dT%H:%M:%S'),
+            'timeZone': 'Europe/Stockholm'
+        },
+        'end': {
+            'dateTime': act_obj.stop.strftime('%Y-%m-%dT%H:%M:%S'),
+            'timeZone': 'Europe/Stockholm'
+        },
+        'extendedProperties': {
+            'private': {
+                KEY_PROPERTY: act_obj.key,
+                SLOT_PROPERTY: act_obj.slot
+            }
+        },
+    }
+
+
+def add_event(act_obj, serv_obj, cal_id):
+    with api_call('events.insert'):
+        serv_obj.events().insert(calendarId=cal_id, body=event_body(act_obj)).execute()
+
+
+def delete_event(serv_obj, cal_id, event_id):
+    with api_call('events.delete'):
+        serv_obj.events().delete(calendarId=cal_id, eventId=event_id).execute()
+
+
+def execute_batch(serv_obj, requests, batch_size=BATCH_SIZE, max_retries=MAX_RETRIES, sleep=time.sleep,
+                  throttle=None, on_chunk=None):
+    """
+    Execute api requests through the batch endpoint, batch_size at a time
+    requests that hit a rate limit, or whose whole batch did, are retried with exponential backoff
+
+    :param requests: list of googleapiclient HttpRequest
+    :param throttle: function, called with the number of requests before each batch is sent, can block
+    :param on_chunk: function, called with the indices of a chunk and the responses so far after each batch,
+        so what went through is known even if a later batch raises
+    :return: tuple, (list of responses, None where the request failed, list of (index, HttpError))
+    """
+
+    responses = [None] * len(requests)
+    errors = {}
+    pending = list(range(len(requests)))
+    for attempt in range(max_retries + 1):
+        if attempt:
+            sleep(2 ** (attempt - 1) + random.random())
+        rate_limited = []
+
+        def callback(request_id, response, exception):
+            idx = int(request_id)
+            if exception is None:
+                responses[idx] = response
+                errors.pop(idx, None)
+                return
+            errors[idx] = exception
+            if is_rate_limit(exception):
+                rate_limited.append(idx)
+
+        for chunk_start in range(0, len(pending), batch_size):
+            chunk = pending[chunk_start:chunk_start + batch_size]
+            if throttle is not None:
+                throttle(len(chunk))
+            batch = serv_obj.new_batch_http_request(callback=callback)
+            for idx in chunk:
+                batch.add(requests[idx], request_id=str(idx))
+            count('batched requests', len(chunk))
+            try:
+                with api_call('batch'):
+                    batch.execute()
+            except HttpError as error:
+                # the batch endpoint itself can refuse the whole chunk
+                if not is_rate_limit(error):
+                    raise
+                for idx in chunk:
+                    errors[idx] = error
+                rate_limited += chunk
+                continue
+            if on_chunk is not None:
+                on_chunk(chunk, responses)
+
+        if not rate_limited:
+            break
+        count('rate limited requests', len(rate_limited))
+        pending = sorted(rate_limited)
+    return responses, sorted(errors.items())
+
+
+def is_rate_limit(error):
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    if error.resp.status != 403:
+        return False
+    try:
+        content = json.loads(error.content.decode('utf-8'))
+        reasons = [item.get('reason') for item in content['error']['errors']]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+    return any(reason in RATE_LIMIT_REASONS for reason in reasons)
+
+
+def print_errors(errors, description):
+    for idx, error in errors:
+        print(f'{description} {idx} failed: {error}')
+
+
+def make_token():
+    from google_auth_oauthlib.flow import InstalledAppFlow  # only needed when there is no usable token
+
+    scopes = ['https://www.googleapis.com/auth/calendar']
+    flow = InstalledAppFlow.from_client_secrets_file('client_secret.json', scopes=scopes)
+    credentials = flow.run_console()
+    save_credentials(credentials)
+    return credentials
+
+
+def save_credentials(credentials):
+    with open('token.pkl', 'wb') as token:
+        pickle.dump(credentials, token)
+
+
+def load_credentials():
+    """Return credentials from token.pkl, refreshed if expired, asks for a new token if they can't be used"""
+
+    if not os.path.exists('token.pkl'):
+        return make_token()
+    with open('token.pkl', 'rb') as file:
+        credentials = pickle.load(file)
+    if credentials.valid:
+        return credentials
+    if credentials.expired and credentials.refresh_token:
+        from google.auth.exceptions import RefreshError
+        from google.auth.transport.requests import Request
+
+        try:
+            credentials.refresh(Request())
+        except RefreshError:
+            return make_token()
+        save_credentials(credentials)
+        return credentials
+    return make_token()
+
+
+@timed('build service')
+def get_service(credentials):
+    """Build the calendar service, the discovery document is cached on disk"""
+
+    return build('calendar', 'v3', credentials=credentials, cache=DiscoveryCache())
+
+
+def get_cal_id(serv_obj, summary, cal_ids=None):
+    """
+    Return id of the calendar with summary, the calendar is created if it doesn't exist
+    ids are cached, pass cal_ids=False to always ask the api
+    """
+
+    return get_cal_ids(serv_obj, [summary], cal_ids)[summary]
+
+
+def get_cal_ids(serv_obj, summaries, cal_ids=None):
+    """
+    Return {summary: calendar id} for many calendars, listing the calendars at most once
+    calendars that don't exist are created
+    """
+
+    if cal_ids is None:
+        cal_ids = calendar_ids()
+    found = {}
+    if cal_ids:
+        found = {summary: cal_ids.get(summary) for summary in summaries}
+        found = {summary: calendar_id for summary, calendar_id in found.items() if calendar_id}
+    missing = [summary for summary in summaries if summary not in found]
+    if not missing:
+        return found
+
+    listed = {calendar['summary']: calendar['id'] for calendar in list_calendars(serv_obj)}
+    for summary in missing:
+        calendar_id = listed.get(summary)
+        if calendar_id is None:
+            with api_call('calendars.insert'):
+                calendar = serv_obj.calendars().insert(
+                    body={'summary': summary, 'timeZone': 'Europe/Stockholm'}
+                ).execute()
+            calendar_id = calendar['id']
+        found[summary] = calendar_id
+        if cal_ids:
+            cal_ids.set(summary, calendar_id)
+    return found
+
+
+def forget_cal_id(summary, cal_ids=None):
+    """Drop the cached id of the calendar with summary, when the calendar turned out to be deleted"""
+
+    if cal_ids is None:
+        cal_ids = calendar_ids()
+    if cal_ids:
+        cal_ids.delete(summary)
+
+
+def calendar_exists(serv_obj, calendar_id):
+    try:
+        with api_call('calendars.get'):
+            serv_obj.calendars().get(calendarId=calendar_id, fields='id').execute()
+    except HttpError as error:
+        if error.resp.status in (404, 410):
+            return False
+        raise
+    return True
+
+
+def list_calendars(serv_obj):
+    """Yield every calendar in the user's calendar list, following nextPageToken"""
+
+    page_token = None
+    while True:
+        with api_call('calendarList.list'):
+            page = serv_obj.calendarList().list(
+                pageToken=page_token,
+                fields='nextPageToken,items(id,summary)'
+            ).execute()
+        yield from page.get('items', [])
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            break
+
+
+def get_event_ids_by_dts(serv_obj, calendar_id, dts):
+    """Return ids of events that start on any of the days in dts"""
+
+    return [event['id'] for event in get_events_by_dts(serv_obj, calendar_id, dts, fields=ID_FIELDS)]
+
+
+def get_events_by_dts(serv_obj, calendar_id, dts, fields=SYNC_FIELDS):
+    """Return events (google event json) that start on any of the days in dts"""
+
+    dttuples = {(dt.year, dt.month, dt.day) for dt in dts}
+    if not dttuples:
+        return []
+
+    # a day of margin on each side, since timeMin and timeMax are in utc
+    time_min = date(*min(dttuples)) - timedelta(days=1)
+    time_max = date(*max(dttuples)) + timedelta(days=2)
+    found = []
+    for event in list_events(serv_obj, calendar_id, time_min, time_max, fields):
+        if 'dateTime' not in event.get('start', {}):
+            continue  # all day event
+        start = parse_caltime(event['start']['dateTime'])
+        if start in dttuples:
+            found.append(event)
+    return found
+
+
+def list_events(serv_obj, calendar_id, time_min, time_max, fields=SYNC_FIELDS):
+    """
+    Yield every event in [time_min, time_max), following nextPageToken
+
+    :param time_min: date
+    :param time_max: date
+    :param fields: str, event fields to request, see SYNC_FIELDS
+    """
+
+    page_token = None
+    while True:
+        with api_call('events.list'):
+            page = serv_obj.events().list(
+                calendarId=calendar_id,
+                timeMin=time_min.isoformat() + 'T00:00:00Z',
+                timeMax=time_max.isoformat() + 'T00:00:00Z',
+                singleEvents=True,
+                maxResults=PAGE_SIZE,
+                pageToken=page_token,
+                fields=f'nextPageToken,items({fields})'
+            ).execute()
+        yield from page.get('items', [])
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            break
+
+
+def parse_caltime(str_):
+    """Make tuple containing date from string (from google event json)
+
+    Param str_: 'yyyy-mm-ddT.......'
+    Return: tuple ({year}, {month}, {day})"""
+    str_ = str_[:str_.index('T')]
+    date = [int(a) for a in str_.split('-')]
+    return tuple(date)
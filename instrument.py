@@ -0,0 +1,204 @@
+"""
+Timing and call counting for a run
+
+    with timer('parse'):
+        ...
+
+    @timed('login')
+    def login(...):
+        ...
+
+    count('webdriver calls')
+    latency('events.list', seconds)
+
+report() prints a table of phases, counters and api latencies, and can write a chrome trace
+(open it in chrome://tracing or https://ui.perfetto.dev)
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+import json
+import math
+import os
+import threading
+import time
+
+# at most this many spans are kept for the trace, so long runs don't grow without bound
+MAX_SPANS = 100000
+# latency percentiles are of the last this many calls of each kind
+MAX_LATENCIES = 10000
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.latencies = {}
+        self.api_calls = {}
+        self.spans = []
+
+    def reset(self):
+        self.__init__()
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator version of timer"""
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_span(self, name, start, duration):
+        with self.lock:
+            calls, total = self.phases.get(name, (0, 0))
+            self.phases[name] = (calls + 1, total + duration)
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append((name, start, duration, threading.get_ident()))
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def latency(self, kind, seconds):
+        """Record one api call of kind that took seconds"""
+
+        with self.lock:
+            self.latencies.setdefault(kind, deque(maxlen=MAX_LATENCIES)).append(seconds)
+            self.api_calls[kind] = self.api_calls.get(kind, 0) + 1
+        self.count('google api calls')
+
+    @contextmanager
+    def api_call(self, kind):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.latency(kind, duration)
+            self.add_span(f'api {kind}', start, duration)
+
+    @staticmethod
+    def percentile(values, percent):
+        values = sorted(values)
+        idx = min(len(values) - 1, max(0, math.ceil(percent / 100 * len(values)) - 1))
+        return values[idx]
+
+    def snapshot(self):
+        """Return copies of (phases, counters, {kind: (calls, latencies)}), safe to read while other threads record"""
+
+        with self.lock:
+            return (
+                dict(self.phases),
+                dict(self.counters),
+                {kind: (self.api_calls[kind], list(values)) for kind, values in self.latencies.items()}
+            )
+
+    def summary(self):
+        """Return the summary as rows of str, for report or logging"""
+
+        phases, counters, api_calls = self.snapshot()
+        rows = [('phase', 'calls', 'total s', '')]
+        for name, (calls, total) in sorted(phases.items(), key=lambda item: -item[1][1]):
+            rows.append((name, str(calls), f'{total:.3f}', ''))
+        rows.append(('counter', 'count', '', ''))
+        for name, value in sorted(counters.items()):
+            rows.append((name, str(value), '', ''))
+        rows.append(('api call', 'calls', 'p50 ms', 'p95 ms'))
+        for kind, (calls, values) in sorted(api_calls.items()):
+            rows.append((
+                kind,
+                str(calls),
+                f'{self.percentile(values, 50) * 1000:.1f}',
+                f'{self.percentile(values, 95) * 1000:.1f}'
+            ))
+        return rows
+
+    def report(self, trace_path=None):
+        from rich.console import Console
+        from rich.table import Table
+
+        table = Table(title=f'run took {time.perf_counter() - self.start:.1f}s')
+        header, *rows = self.summary()
+        for column in header:
+            table.add_column(column)
+        for row in rows:
+            table.add_row(*row)
+        Console().print(table)
+        if trace_path:
+            self.write_trace(trace_path)
+
+    def write_trace(self, path):
+        """Write spans as chrome trace events"""
+
+        pid = os.getpid()
+        events = [
+            {
+                'name': name,
+                'ph': 'X',
+                'ts': round((start - self.start) * 1e6),
+                'dur': round(duration * 1e6),
+                'pid': pid,
+                'tid': tid
+            }
+            for name, start, duration, tid in self.spans
+        ]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'otherData': {'counters': self.counters}}, file)
+
+
+recorder = Recorder()
+timer = recorder.timer
+timed = recorder.timed
+count = recorder.count
+latency = recorder.latency
+api_call = recorder.api_call
+report = recorder.report
+snapshot = recorder.snapshot
+
+
+class CountedDriver:
+    """
+    Wraps a selenium WebDriver, or a WebElement found through one, and counts every call that goes to the browser
+    methods and properties like element.text are counted, elements that calls return are wrapped too
+    """
+
+    def __init__(self, wrapped, counter='webdriver calls'):
+        self.wrapped = wrapped
+        self.counter = counter
+
+    def __getattr__(self, name):
+        value = getattr(self.wrapped, name)
+        if isinstance(getattr(type(self.wrapped), name, None), property):
+            count(self.counter)
+            return self.wrap(value)
+        if not callable(value):
+            return value
+
+        @wraps(value)
+        def call(*args, **kwargs):
+            count(self.counter)
+            return self.wrap(value(*args, **kwargs))
+        return call
+
+    def wrap(self, value):
+        from selenium.webdriver.remote.webelement import WebElement
+
+        if isinstance(value, WebElement):
+            return CountedDriver(value, self.counter)
+        if isinstance(value, list):
+            return [self.wrap(item) for item in value]
+        return value
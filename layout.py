@@ -0,0 +1,109 @@
+"""Geometric index for matching timetable boxes to timestamps and attributes"""
+
+from bisect import bisect_left, bisect_right
+
+
+class StampGroup:
+    """Timestamps in a day column that share an x coordinate, sorted on y"""
+
+    def __init__(self, x, stamps):
+        """
+        :param x: int, x coordinate shared by the stamps
+        :param stamps: list of (order, stamp), order is the stamp's position in the timestamp list
+        """
+
+        self.x = x
+        stamps = sorted(stamps, key=lambda item: item[1]['coords'].y)
+        self.ys = [stamp['coords'].y for order, stamp in stamps]
+
+        # best[i] is the stamp that comes last in the timestamp list among stamps[:i + 1]
+        self.best = []
+        last = None
+        for order, stamp in stamps:
+            if last is None or order > last[0]:
+                last = (order, stamp)
+            self.best.append(last)
+
+    def last_above(self, y):
+        """Return (order, stamp) of the last stamp with stamp y < y, or None"""
+
+        idx = bisect_left(self.ys, y)
+        if not idx:
+            return None
+        return self.best[idx - 1]
+
+
+class LayoutIndex:
+    """
+    Built once per page
+    answers which timestamp belongs to a box edge and which attributes are inside a box
+    in logarithmic time instead of scanning every timestamp and attribute per box
+    """
+
+    def __init__(self, days, day_width, timestamps, attributes):
+        """
+        :param days: list of dicts with 'coords' and 'date', from Schedule.parse
+        :param day_width: float, width of a day column
+        :param timestamps: list of dicts with 'datetime' and 'coords'
+        :param attributes: list of SnappyElement, textboxes that aren't timestamps
+        """
+
+        self.days = days
+        self.day_width = day_width
+
+        self.columns = []
+        for day in days:
+            day_x = day['coords'].x
+            by_x = {}
+            for order, stamp in enumerate(timestamps):
+                if day_x < stamp['coords'].x < day_x + day_width:
+                    by_x.setdefault(stamp['coords'].x, []).append((order, stamp))
+            groups = [StampGroup(x, by_x[x]) for x in sorted(by_x)]
+            self.columns.append(([group.x for group in groups], groups))
+
+        self.attributes = sorted(enumerate(attributes), key=lambda item: item[1].coords.y)
+        self.attribute_ys = [attribute.coords.y for order, attribute in self.attributes]
+
+    def day_index(self, coords):
+        """Return index of the day column that coords are in"""
+
+        for idx in range(len(self.days) - 1, -1, -1):
+            if coords >= self.days[idx]['coords']:
+                return idx
+        return 0
+
+    def timestamp(self, day_idx, min_x, max_y):
+        """
+        :param day_idx: int, from day_index
+        :param min_x: int, stamps must be to the right of this
+        :param max_y: int, stamps must be above this
+        :return: datetime of the matching timestamp that comes last on the page, or False
+        """
+
+        xs, groups = self.columns[day_idx]
+        found = None
+        for group in groups[bisect_right(xs, min_x):]:
+            candidate = group.last_above(max_y)
+            if candidate is not None and (found is None or candidate[0] > found[0]):
+                found = candidate
+        if found is None:
+            return False
+        return found[1]['datetime']
+
+    def start(self, day_idx, box_coords):
+        return self.timestamp(day_idx, float('-inf'), box_coords.y)
+
+    def stop(self, day_idx, box_coords, corner):
+        return self.timestamp(day_idx, box_coords.x, corner.y)
+
+    def attributes_inside(self, box_coords, corner):
+        """Return attributes strictly inside the rectangle, in page order"""
+
+        lo = bisect_right(self.attribute_ys, box_coords.y)
+        hi = bisect_left(self.attribute_ys, corner.y)
+        inside = [
+            (order, attribute) for order, attribute in self.attributes[lo:hi]
+            if box_coords.x < attribute.coords.x < corner.x
+        ]
+        inside.sort(key=lambda item: item[0])
+        return [attribute for order, attribute in inside]
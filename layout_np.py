@@ -0,0 +1,138 @@
+"""
+Numpy version of Schedule.match_boxes, for large pages
+gives the same matches as the python loop, needs numpy
+"""
+
+import numpy as np
+
+from scraper import NON_CLASS_CLRS
+
+
+def parse_px(values):
+    return np.array([int(value[:-2]) for value in values], dtype=np.int64)
+
+
+def parse_rgb(style):
+    return [int(num) for num in style['background-color'][4:-1].split(', ')]
+
+
+def class_box_mask(boxes, box_x, days, day_width):
+    """Mask of boxes that represent events, inside the day columns and not in NON_CLASS_CLRS"""
+
+    in_days = (box_x >= days[0]['coords'].x) & (box_x <= days[-1]['coords'].x + day_width)
+    # only boxes inside the days are parsed, same as the python loop
+    clrs = np.full((len(boxes), 3), -1, dtype=np.int64)
+    for idx in np.flatnonzero(in_days):
+        clrs[idx] = parse_rgb(boxes[idx].style)
+    non_class = np.array(NON_CLASS_CLRS, dtype=np.int64)
+    is_non_class = (clrs[:, None, :] == non_class[None, :, :]).all(axis=2).any(axis=1)
+    return in_days & ~is_non_class
+
+
+def day_indexes(box_x, box_y, day_x, day_y):
+    """Index of the last day with coords <= the box's, 0 if there is none"""
+
+    ge = (box_x[:, None] >= day_x[None, :]) & (box_y[:, None] >= day_y[None, :])
+    last = ge.shape[1] - 1 - np.argmax(ge[:, ::-1], axis=1)
+    return np.where(ge.any(axis=1), last, 0)
+
+
+def last_above(stamp_y, stamp_order, max_y):
+    """
+    For every max_y, order of the stamp with the highest order among stamps with y < max_y, -1 if none
+    stamp_y has to be sorted
+    """
+
+    best = np.maximum.accumulate(stamp_order)
+    idx = np.searchsorted(stamp_y, max_y, side='left')
+    return np.where(idx > 0, best[np.maximum(idx - 1, 0)], -1)
+
+
+def match_stamps(box_x, box_y, corner_y, box_day, days, day_width, stamp_x, stamp_y):
+    """Return order of the start and stop timestamp for every box, -1 where there is none"""
+
+    start = np.full(len(box_x), -1, dtype=np.int64)
+    stop = np.full(len(box_x), -1, dtype=np.int64)
+    orders = np.arange(len(stamp_x))
+    for day_idx, day in enumerate(days):
+        boxes = np.flatnonzero(box_day == day_idx)
+        if not len(boxes):
+            continue
+        day_x = day['coords'].x
+        in_column = (stamp_x > day_x) & (stamp_x < day_x + day_width)
+        col_x, col_y, col_order = stamp_x[in_column], stamp_y[in_column], orders[in_column]
+        if not len(col_x):
+            continue
+
+        by_y = np.argsort(col_y, kind='stable')
+        start[boxes] = last_above(col_y[by_y], col_order[by_y], box_y[boxes])
+
+        # stops have to be right of the box, stamps in a column share a few x coordinates
+        for x in np.unique(col_x):
+            group = col_x == x
+            group_y, group_order = col_y[group], col_order[group]
+            by_y = np.argsort(group_y, kind='stable')
+            found = last_above(group_y[by_y], group_order[by_y], corner_y[boxes])
+            found = np.where(x > box_x[boxes], found, -1)
+            stop[boxes] = np.maximum(stop[boxes], found)
+    return start, stop
+
+
+def attributes_inside(box_x, box_y, corner_x, corner_y, attr_x, attr_y):
+    """Return a list of attribute indexes for every box, in page order"""
+
+    by_y = np.argsort(attr_y, kind='stable')
+    sorted_y = attr_y[by_y]
+    lo = np.searchsorted(sorted_y, box_y, side='right')
+    hi = np.searchsorted(sorted_y, corner_y, side='left')
+    counts = np.maximum(hi - lo, 0)
+
+    # every (box, attribute) pair in the boxes' y ranges, flattened
+    owners = np.repeat(np.arange(len(box_x)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    candidates = by_y[np.repeat(lo, counts) + offsets]
+
+    inside = (attr_x[candidates] > box_x[owners]) & (attr_x[candidates] < corner_x[owners])
+    owners, candidates = owners[inside], candidates[inside]
+    order = np.lexsort((candidates, owners))
+    owners, candidates = owners[order], candidates[order]
+
+    splits = np.searchsorted(owners, np.arange(1, len(box_x)))
+    return [part.tolist() for part in np.split(candidates, splits)]
+
+
+def match_boxes(days, day_width, timestamps, attributes, boxes):
+    """Same as Schedule.match_boxes"""
+
+    box_x = np.array([box.coords.x for box in boxes], dtype=np.int64)
+    mask = class_box_mask(boxes, box_x, days, day_width)
+    class_boxes = [boxes[idx] for idx in np.flatnonzero(mask)]
+    if not class_boxes:
+        return []
+
+    box_x = box_x[mask]
+    box_y = np.array([box.coords.y for box in class_boxes], dtype=np.int64)
+    corner_x = box_x + parse_px([box.style['width'] for box in class_boxes])
+    corner_y = box_y + parse_px([box.style['height'] for box in class_boxes])
+
+    day_x = np.array([day['coords'].x for day in days])
+    day_y = np.array([day['coords'].y for day in days])
+    box_day = day_indexes(box_x, box_y, day_x, day_y)
+
+    stamp_x = np.array([stamp['coords'].x for stamp in timestamps], dtype=np.float64)
+    stamp_y = np.array([stamp['coords'].y for stamp in timestamps], dtype=np.float64)
+    start, stop = match_stamps(box_x, box_y, corner_y, box_day, days, day_width, stamp_x, stamp_y)
+
+    found = np.flatnonzero((start >= 0) & (stop >= 0))
+    attr_x = np.array([attribute.coords.x for attribute in attributes], dtype=np.float64)
+    attr_y = np.array([attribute.coords.y for attribute in attributes], dtype=np.float64)
+    inside = attributes_inside(box_x[found], box_y[found], corner_x[found], corner_y[found], attr_x, attr_y)
+
+    return [
+        (
+            timestamps[start[idx]]['datetime'],
+            timestamps[stop[idx]]['datetime'],
+            [attributes[attr_idx] for attr_idx in attr_idxs]
+        )
+        for idx, attr_idxs in zip(found, inside)
+    ]
@@ -0,0 +1,216 @@
+"""
+Load test of fanout.py against an in-process fake of the calendar api
+the fake has its own per minute quota and answers 429 when it's exceeded, like the real api,
+so the token buckets can be tuned without spending real quota
+
+Usage: python loadtest.py [calendars] [weeks] [workers] [api rate] [project rate] [user rate]
+"""
+
+from fanout import FanOut, Quota, USER_RATE
+from scraper import Event
+from JsonDateTime import JsonDateTime
+import instrument
+
+from apiclient.errors import HttpError
+import httplib2
+
+from datetime import date, timedelta
+import itertools
+import json
+import sys
+import threading
+import time
+
+# seconds a batch request takes, and each call in it
+BATCH_LATENCY = 0.02
+CALL_LATENCY = 0.002
+RATE_LIMITED = json.dumps(
+    {'error': {'code': 429, 'errors': [{'reason': 'rateLimitExceeded'}]}}
+).encode('utf-8')
+NOT_FOUND = json.dumps({'error': {'code': 404, 'errors': [{'reason': 'notFound'}]}}).encode('utf-8')
+
+
+class FakeRequest:
+    def __init__(self, api, func):
+        self.api = api
+        self.func = func
+
+    def execute(self):
+        return self.api.call(self.func)
+
+
+class FakeCollection:
+    """Stands in for serv_obj.events(), calendars() and calendarList()"""
+
+    def __init__(self, api):
+        self.api = api
+
+    def list(self, calendarId=None, timeMin=None, timeMax=None, pageToken=None, **kwargs):
+        if calendarId is None:
+            return FakeRequest(self.api, lambda: {
+                'items': [{'id': id_, 'summary': summary} for summary, id_ in self.api.calendars.items()]
+            })
+        return FakeRequest(self.api, lambda: {'items': [
+            event for event in self.api.calendar(calendarId).values()
+            if timeMin[:10] <= event['start']['dateTime'][:10] < timeMax[:10]
+        ]})
+
+    def get(self, calendarId, **kwargs):
+        return FakeRequest(self.api, lambda: self.api.calendar(calendarId) and {'id': calendarId})
+
+    def insert(self, calendarId=None, body=None, **kwargs):
+        if calendarId is None:
+            return FakeRequest(self.api, lambda: self.api.add_calendar(body['summary']))
+        return FakeRequest(self.api, lambda: self.api.put(calendarId, dict(body, id=self.api.new_id())))
+
+    def patch(self, calendarId, eventId, body, **kwargs):
+        return FakeRequest(self.api, lambda: self.api.patch(calendarId, eventId, body))
+
+    def delete(self, calendarId, eventId, **kwargs):
+        return FakeRequest(self.api, lambda: self.api.delete(calendarId, eventId))
+
+
+class FakeBatch:
+    def __init__(self, api, callback):
+        self.api = api
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        time.sleep(BATCH_LATENCY)
+        for request_id, request in self.requests:
+            try:
+                response = request.execute()
+            except HttpError as error:
+                self.callback(request_id, None, error)
+            else:
+                self.callback(request_id, response, None)
+
+
+class FakeCalendarApi:
+    """Calendar service with a quota of rate calls per second, counted per minute like the real api's quotas"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.calendars = {}
+        self.events = {}
+        self.ids = itertools.count()
+        self.calendar_ids = itertools.count()
+        self.lock = threading.Lock()
+        self.window = (0, 0)
+        self.calls = 0
+        self.rejected = 0
+
+    def service(self):
+        return FakeService(self)
+
+    def new_id(self):
+        return f'event{next(self.ids)}'
+
+    def add_calendar(self, summary):
+        with self.lock:
+            id_ = f'calendar{next(self.calendar_ids)}'
+            self.calendars[summary] = id_
+            self.events[id_] = {}
+        return {'id': id_, 'summary': summary}
+
+    def put(self, calendar_id, event):
+        self.calendar(calendar_id)[event['id']] = dict(event, etag=self.new_id())
+        return self.events[calendar_id][event['id']]
+
+    def patch(self, calendar_id, event_id, body):
+        if event_id not in self.calendar(calendar_id):
+            raise HttpError(httplib2.Response({'status': 404}), NOT_FOUND)
+        return self.put(calendar_id, dict(self.events[calendar_id][event_id], **body))
+
+    def delete(self, calendar_id, event_id):
+        if self.calendar(calendar_id).pop(event_id, None) is None:
+            raise HttpError(httplib2.Response({'status': 404}), NOT_FOUND)
+        return {}
+
+    def calendar(self, calendar_id):
+        if calendar_id not in self.events:
+            raise HttpError(httplib2.Response({'status': 404}), NOT_FOUND)
+        return self.events[calendar_id]
+
+    def call(self, func):
+        """Count the call against the quota and run it, or answer 429"""
+
+        with self.lock:
+            minute = int(time.monotonic() // 60)
+            window, calls = self.window
+            calls = calls + 1 if window == minute else 1
+            self.window = (minute, calls)
+            self.calls += 1
+            if calls > self.rate * 60:
+                self.rejected += 1
+                raise HttpError(httplib2.Response({'status': 429}), RATE_LIMITED)
+        time.sleep(CALL_LATENCY)
+        return func()
+
+
+class FakeService:
+    def __init__(self, api):
+        self.api = api
+
+    def events(self):
+        return FakeCollection(self.api)
+
+    def calendars(self):
+        return FakeCollection(self.api)
+
+    def calendarList(self):
+        return FakeCollection(self.api)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self.api, callback)
+
+
+def make_week(monday, lessons=6):
+    """A week of lessons, like a scraped one"""
+
+    events = []
+    days = []
+    for day in range(5):
+        dt = monday + timedelta(days=day)
+        days.append(JsonDateTime(dt.year, dt.month, dt.day))
+        for lesson in range(lessons):
+            start = JsonDateTime(dt.year, dt.month, dt.day, 8 + lesson)
+            events.append(Event(f'subject {lesson}', f'room {day}', start, start + timedelta(minutes=50)))
+    return events, days
+
+
+def main(calendars=10, weeks=4, workers=4, api_rate=20, project_rate=18, user_rate=USER_RATE):
+    api = FakeCalendarApi(api_rate)
+    fan_out = FanOut(
+        api.service,
+        workers,
+        Quota(project_rate, user_rate),
+        state_path=':memory:',
+        cal_ids=False
+    )
+    today = date.today()
+    monday = today - timedelta(days=today.weekday())
+    events, days = [], []
+    for week in range(weeks):
+        week_events, week_days = make_week(monday + timedelta(weeks=week))
+        events += week_events
+        days += week_days
+    for calendar in range(calendars):
+        fan_out.add(f'load test {calendar}', events, days, f'user {calendar % 4}')
+
+    start = time.perf_counter()
+    errors = fan_out.run()
+    elapsed = time.perf_counter() - start
+    accepted = api.calls - api.rejected
+    print(f'{fan_out.done} jobs, {len(errors)} failed, {elapsed:.1f}s')
+    print(f'{accepted / elapsed:.1f} ops/s sustained, {api.rejected} of {api.calls} calls rate limited '
+          f'({api.rejected / max(1, api.calls):.1%})')
+    instrument.report()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:7]))
@@ -0,0 +1,85 @@
+"""
+Clean up scraped events before they are exported or synced
+events are sorted, exact duplicates from overlapping scrapes are dropped,
+lessons split in back to back blocks are merged into one event, and events that overlap are reported
+"""
+
+import heapq
+
+
+class Normalized:
+    def __init__(self, events, duplicates, merges, overlaps):
+        """
+        :param events: list of Event, sorted on start
+        :param duplicates: int, events dropped since an identical event was already there
+        :param merges: int, events merged into the event before them
+        :param overlaps: list of (Event, Event), events that overlap in time, in order of the second's start
+        """
+
+        self.events = events
+        self.duplicates = duplicates
+        self.merges = merges
+        self.overlaps = overlaps
+
+    def __str__(self):
+        return f'{len(self.events)} events, {self.duplicates} duplicates dropped, ' \
+               f'{self.merges} merged, {len(self.overlaps)} overlapping'
+
+    @classmethod
+    def from_events(cls, events):
+        """Sort, de-duplicate and merge events, then find overlaps, O(n log n) plus the overlaps found"""
+
+        events, duplicates, merges = cls.merge(
+            sorted(events, key=lambda event: (event.start, event.stop, event.act, event.place, event.info))
+        )
+        return cls(events, duplicates, merges, cls.find_overlaps(events))
+
+    @staticmethod
+    def merge(events):
+        """
+        :param events: iterable of Event, sorted on start
+        :return: tuple, (list of Event, duplicates dropped, events merged)
+        """
+
+        merged = []
+        seen = set()
+        # (act, place, info) -> index in merged of that lesson's latest block
+        blocks = {}
+        duplicates = 0
+        merges = 0
+        for event in events:
+            lesson = (event.act, event.place, event.info)
+            content = (event.start, event.stop) + lesson
+            if content in seen:
+                duplicates += 1
+                continue
+            seen.add(content)
+
+            idx = blocks.get(lesson)
+            if idx is not None and merged[idx].stop == event.start:
+                # the next block of a split lesson, the start stays, so merged stays sorted
+                block = merged[idx]
+                merged[idx] = type(block)(block.act, block.place, block.start, event.stop, block.info)
+                merges += 1
+                continue
+            blocks[lesson] = len(merged)
+            merged.append(event)
+        return merged, duplicates, merges
+
+    @staticmethod
+    def find_overlaps(events):
+        """
+        Sweep events in order of start, keeping a heap of the ones that haven't ended yet
+
+        :param events: list of Event, sorted on start
+        :return: list of (Event, Event)
+        """
+
+        overlaps = []
+        ongoing = []
+        for idx, event in enumerate(events):
+            while ongoing and ongoing[0][0] <= event.start:
+                heapq.heappop(ongoing)
+            overlaps += [(events[other], event) for _, other in ongoing]
+            heapq.heappush(ongoing, (event.stop, idx))
+        return overlaps
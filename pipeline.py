@@ -0,0 +1,175 @@
+"""
+Scrape and upload at the same time
+each week's events are put on an asyncio queue as soon as they are parsed,
+and uploaders sync them to google calendar while the next week is scraped
+
+Usage: python pipeline.py config.json [uploaders], the config is the same as for batch.py
+plans are made from the same local state store as the sync command, "state": "path/to/state.sqlite3" to use another one
+"""
+
+from scraper import Schedule
+from JsonDateTime import JsonDateTime
+from batch import load_config, get_password
+from gcal import load_credentials, get_service, get_cal_id, print_errors
+from state import StateStore, STATE_PATH
+from weekcache import WeekCache
+import sync
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+import sys
+
+UPLOADERS = 4
+QUEUE_SIZE = 8
+
+
+class Week:
+    def __init__(self, target, week, events, days_updated, changes=()):
+        """:param changes: list of (key, fingerprint, events, days updated), to put in the cache once uploaded"""
+
+        self.target = target
+        self.week = week
+        self.events = events
+        self.days_updated = days_updated
+        self.changes = changes
+
+    def __str__(self):
+        return f'{self.target.sche_type} {self.target.schedule_id} week {self.week}'
+
+
+class Pipeline:
+    def __init__(self, config, password, credentials, uploaders=UPLOADERS):
+        self.config = config
+        self.password = password
+        self.credentials = credentials
+        self.uploaders = uploaders
+        self.local = threading.local()
+        self.stores = []
+        self.calendar_id = None
+        self.cache = WeekCache(config['cache']) if config.get('cache') else None
+        # the cache, the calendar id and the list of stores are changed from the upload threads
+        self.cache_lock = threading.Lock()
+
+    def service(self):
+        """googleapiclient isn't thread safe, every upload thread builds its own service"""
+
+        if not hasattr(self.local, 'service'):
+            self.local.service = get_service(self.credentials)
+        return self.local.service
+
+    def store(self):
+        """
+        sqlite connections can't be shared between threads either, every upload thread opens its own store,
+        run closes them all once the threads are done
+        """
+
+        if not hasattr(self.local, 'store'):
+            self.local.store = StateStore(self.config.get('state', STATE_PATH), check_same_thread=False)
+            with self.cache_lock:
+                self.stores.append(self.local.store)
+        return self.local.store
+
+    def close_stores(self):
+        with self.cache_lock:
+            stores, self.stores = self.stores, []
+        for store in stores:
+            store.close()
+
+    def scrape(self, loop, queue):
+        """Runs in a thread, puts a Week on the queue for every parsed week"""
+
+        dt = JsonDateTime.now()
+        browser = Schedule.start_browser(self.config.get('headless', True))
+        try:
+            Schedule.login(browser, self.config['username'], self.password)
+            for target in self.config['targets']:
+                for week in target.weeks:
+                    events, days_updated, changes = Schedule.get_changed_weeks(
+                        browser,
+                        target.school,
+                        target.sche_type,
+                        target.schedule_id,
+                        [week],
+                        dt,
+                        self.cache
+                    )
+                    if not days_updated:
+                        continue  # unchanged since the last run
+                    # blocks while the queue is full, so scraping can't run away from uploading
+                    asyncio.run_coroutine_threadsafe(
+                        queue.put(Week(target, week, events, days_updated, changes)), loop
+                    ).result()
+        finally:
+            browser.quit()
+
+    def upload(self, week):
+        """Runs in a thread, syncs one week to the calendar"""
+
+        service = self.service()
+        store = self.store()
+        with self.cache_lock:
+            calendar_id = self.calendar_id
+        # a deleted calendar is replaced under the lock, so only the first thread to find it gone makes a new one
+        calendar_id, plan, errors = sync.sync_events(
+            service, store, self.config.get('calendar', 'schedule_migrater'), calendar_id,
+            week.events, week.days_updated, lock=self.cache_lock
+        )
+        print(f'{week}: {plan}')
+        print_errors(errors, f'{week}:')
+        with self.cache_lock:
+            self.calendar_id = calendar_id
+            if errors or self.cache is None:
+                return  # a week with failed calls isn't cached, so the next run uploads it again
+            for change in week.changes:
+                self.cache.put(*change)
+
+    async def uploader(self, loop, executor, queue):
+        while True:
+            week = await queue.get()
+            try:
+                if week is None:
+                    break
+                try:
+                    await loop.run_in_executor(executor, self.upload, week)
+                except Exception as error:
+                    # one failed week shouldn't stop the rest from uploading
+                    print(f'{week}: upload failed: {error}')
+            finally:
+                queue.task_done()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self.calendar_id = get_cal_id(self.service(), self.config.get('calendar', 'schedule_migrater'))
+
+        try:
+            with ThreadPoolExecutor(self.uploaders) as upload_executor, ThreadPoolExecutor(1) as scrape_executor:
+                uploaders = [
+                    asyncio.create_task(self.uploader(loop, upload_executor, queue))
+                    for _ in range(self.uploaders)
+                ]
+                try:
+                    await loop.run_in_executor(scrape_executor, self.scrape, loop, queue)
+                finally:
+                    for _ in uploaders:
+                        await queue.put(None)
+                    await asyncio.gather(*uploaders)
+                    if self.cache is not None:
+                        self.cache.save()
+        finally:
+            self.close_stores()
+
+
+def main(config_path, uploaders=UPLOADERS):
+    config = load_config(config_path)
+    pipeline = Pipeline(config, get_password(), load_credentials(), uploaders)
+
+    start = time.perf_counter()
+    asyncio.run(pipeline.run())
+    print(f'done in {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], *map(int, sys.argv[2:3]))
@@ -0,0 +1,182 @@
+"""
+Scrape many schedules in parallel, with a pool of headless browsers
+each worker logs in once and then takes (target, week) jobs from a shared queue
+
+Usage: python pool.py config.json [workers], the config is the same as for batch.py
+"""
+
+from scraper import Schedule
+from JsonDateTime import JsonDateTime
+import storage
+from batch import load_config, get_password
+
+from selenium.common.exceptions import WebDriverException
+from rich.console import Console
+from rich.table import Table
+
+from queue import Queue, Empty
+import threading
+import time
+import sys
+
+
+class Job:
+    def __init__(self, target_idx, target, week):
+        self.target_idx = target_idx
+        self.target = target
+        self.week = week
+        self.attempts = 0
+
+    def __str__(self):
+        return f'{self.target.sche_type} {self.target.schedule_id} week {self.week}'
+
+
+class Worker(threading.Thread):
+    def __init__(self, pool, name):
+        super().__init__(name=name, daemon=True)
+        self.pool = pool
+        self.browser = None
+        self.done = 0
+        self.failed = 0
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    job = self.pool.jobs.get_nowait()
+                except Empty:
+                    break
+                try:
+                    self.do_job(job)
+                finally:
+                    self.pool.jobs.task_done()
+        finally:
+            self.close()
+
+    def do_job(self, job):
+        job.attempts += 1
+        try:
+            if self.browser is None:
+                self.browser = Schedule.start_browser(headless=self.pool.headless)
+                Schedule.login(self.browser, self.pool.username, self.pool.password)
+            events, days_updated = Schedule.get_weeks(
+                self.browser,
+                job.target.school,
+                job.target.sche_type,
+                job.target.schedule_id,
+                [job.week],
+                self.pool.dt
+            )
+        except Exception as error:
+            # parse errors on a half loaded page are retried like driver errors,
+            # an uncaught one would end the worker and lose the job
+            if isinstance(error, WebDriverException):
+                # the session might be broken, log in again on the next job
+                self.close()
+            if job.attempts < self.pool.retries:
+                self.pool.jobs.put(job)
+            else:
+                self.failed += 1
+                self.pool.add_error(job, error)
+            return
+        self.done += 1
+        self.pool.add_result(job, events, days_updated)
+
+    def close(self):
+        if self.browser is not None:
+            try:
+                self.browser.quit()
+            except WebDriverException:
+                pass
+            self.browser = None
+
+
+class ScraperPool:
+    def __init__(self, username, password, workers=4, retries=3, headless=True):
+        self.username = username
+        self.password = password
+        self.workers = workers
+        self.retries = retries
+        self.headless = headless
+        self.dt = None
+        self.jobs = Queue()
+        self.lock = threading.Lock()
+        self.results = {}
+        self.errors = []
+        self.elapsed = 0
+
+    def add_result(self, job, events, days_updated):
+        with self.lock:
+            self.results[(job.target_idx, job.week)] = (events, days_updated)
+
+    def add_error(self, job, error):
+        with self.lock:
+            self.errors.append((job, error))
+
+    def scrape(self, targets):
+        """
+        :param targets: list of batch.Target
+        :return: list of Schedule, one per target, weeks that failed every retry are left out
+        """
+
+        self.dt = JsonDateTime.now()
+        self.results = {}
+        self.errors = []
+        for target_idx, target in enumerate(targets):
+            for week in target.weeks:
+                self.jobs.put(Job(target_idx, target, week))
+
+        start = time.perf_counter()
+        self.threads = [Worker(self, f'worker-{i + 1}') for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+        for thread in self.threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - start
+
+        # merge weeks in the same order as the sequential get_schedule loop
+        schedules = []
+        for target_idx, target in enumerate(targets):
+            schedule = []
+            days_updated = []
+            for week in target.weeks:
+                if (target_idx, week) in self.results:
+                    events, days = self.results[(target_idx, week)]
+                    schedule += events
+                    days_updated += days
+            schedules.append(Schedule(schedule, self.dt, days_updated).compact())
+        return schedules
+
+    def report(self, console=None):
+        console = console or Console()
+        table = Table(title='scraper pool')
+        for column in ('worker', 'weeks done', 'weeks failed'):
+            table.add_column(column)
+        for thread in self.threads:
+            table.add_row(thread.name, str(thread.done), str(thread.failed))
+        console.print(table)
+
+        done = len(self.results)
+        rate = done / self.elapsed if self.elapsed else 0
+        console.print(f'{done} weeks in {self.elapsed:.1f}s ({rate:.2f} weeks/s), {len(self.errors)} failed')
+        for job, error in self.errors:
+            console.print(f'  {job}: {error}')
+
+
+def main(config_path, workers=4):
+    config = load_config(config_path)
+    pool = ScraperPool(
+        config['username'],
+        get_password(),
+        workers=workers,
+        retries=config.get('retries', 3),
+        headless=config.get('headless', True)
+    )
+    schedules = pool.scrape(config['targets'])
+    for target, schedule in zip(config['targets'], schedules):
+        storage.save(schedule, target.output)
+    pool.report()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], *map(int, sys.argv[2:3]))
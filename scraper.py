@@ -1,22 +1,62 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.chrome.options import Options as ChromeOptions
+# selenium and rich are imported where they are used,
+# so loading and exporting saved schedules doesn't pay for them, see cli.py
 from getpass import getpass
 from urllib.parse import quote
 from string import digits
 import operator
+import hashlib
+import time
+import sys
+from array import array
+from datetime import timedelta
 from JsonDateTime import JsonDateTime
+from layout import LayoutIndex
+from normalize import Normalized
+from instrument import timer, timed, count, CountedDriver
+from export import export
 from pprint import pprint
 import json
-import os
-import csv
-from rich.progress import track
+
+# initial url is for login site
+# base_url is for joining with school
+LOGIN_URL = 'https://login001.stockholm.se/siteminderagent/forms/loginForm.jsp?SMAGENTNAME=login001-ext.stockholm' \
+            '.se&POSTTARGET=https://login001.stockholm.se/NECSedu/form/b64startpage.jsp?startpage' \
+            '=aHR0cHM6Ly9mbnMuc3RvY2tob2xtLnNlL25nL3RpbWV0YWJsZS90aW1ldGFibGUtdmlld2VyL2Zucy5zdG9ja2hvbG0uc2Uv' \
+            '&TARGET=-SM-https://fns.stockholm.se/ng/timetable/timetable-viewer/fns.stockholm.se/ '
+BASE_URL = 'https://fns.stockholm.se/ng/timetable/timetable-viewer/fns.stockholm.se/'
+WEEK_PATH = 'week/{week}'
+
+# the timetable counts as rendered when it hasn't changed for this long
+RENDER_QUIET_MS = 300
+RENDER_TIMEOUT = 10
+# seconds selenium waits for the render script past its own timeout, so the script's false wins the race
+RENDER_SCRIPT_MARGIN = 2
+
+SCHE_TYPES = (
+    'class',
+    'personal id',
+    'room',
+    'teacher',
+    'subject'
+)
+# clrs that boxes representing events don't have
+NON_CLASS_CLRS = (
+    (0, 0, 0),
+    (204, 204, 204),
+    (211, 211, 211)
+)
+
+DROP_DOWN_ID = {
+    'class': 'classDropDown',
+    'room': 'roomDropDown',
+    'teacher': 'teacherDropDown',
+    'subject': 'subjectDropDown'
+}
 
 
 class Coords:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -48,22 +88,108 @@ class Coords:
 class SnappyElement:
     """SnappyElement contains the information from WebElement that is used"""
 
-    def __init__(self, element):
-        self.text = element.text
-        self.coords = Coords.from_element(element)
-        self.style = self.parse_attribute(element, 'style')
+    __slots__ = ('text', 'coords', 'style')
+
+    # the only style properties parse reads, the rest are thrown away
+    USED_STYLES = frozenset(('width', 'height', 'background-color'))
+
+    # Collects text, location and style of every element with a class in one round trip,
+    # instead of three WebDriver calls per element
+    SNAPSHOT_SCRIPT = """
+        var snapshot = {};
+        for (var i = 0; i < arguments[0].length; i++) {
+            var class_name = arguments[0][i];
+            var elements = document.getElementsByClassName(class_name);
+            snapshot[class_name] = [];
+            for (var j = 0; j < elements.length; j++) {
+                var element = elements[j];
+                var rect = element.getBoundingClientRect();
+                snapshot[class_name].push({
+                    'text': element.innerText.trim(),
+                    'x': Math.round(rect.left + window.pageXOffset),
+                    'y': Math.round(rect.top + window.pageYOffset),
+                    'style': element.getAttribute('style') || ''
+                });
+            }
+        }
+        return JSON.stringify(snapshot);
+    """
+
+    def __init__(self, text, coords, style):
+        self.text = text
+        self.coords = coords
+        self.style = style
+
+    @classmethod
+    def from_element(cls, element):
+        return cls(
+            element.text,
+            Coords.from_element(element),
+            cls.parse_attribute(element.get_attribute('style'))
+        )
+
+    @classmethod
+    def from_dict(cls, dict_):
+        return cls(
+            dict_['text'],
+            Coords(dict_['x'], dict_['y']),
+            cls.parse_attribute(dict_['style'])
+        )
+
+    @classmethod
+    def raw_snapshot(cls, selenium, class_names):
+        """
+        :param selenium: selenium WebDriver object, with the timetable loaded
+        :param class_names: iterable, class names of the elements to collect
+        :return: dict, class name -> list of element dicts with text, x, y and style
+        """
+
+        from selenium.common.exceptions import WebDriverException
+        from rich.progress import track
+
+        class_names = list(class_names)
+        with timer('collect elements'):
+            try:
+                payload = json.loads(selenium.execute_script(cls.SNAPSHOT_SCRIPT, class_names))
+                return {class_name: payload[class_name] for class_name in class_names}
+            except (WebDriverException, TypeError, ValueError, KeyError):
+                # fallback: one element at a time
+                return {
+                    class_name: list(map(cls.element_dict, track(
+                        selenium.find_elements_by_class_name(class_name),
+                        description=f'getting {class_name} elements from website'
+                    )))
+                    for class_name in class_names
+                }
 
     @staticmethod
-    def parse_attribute(element, attribute):
-        style_str = element.get_attribute(attribute)
-        style_list = style_str.split('; ')
+    def element_dict(element):
+        coords = element.location
+        return {
+            'text': element.text,
+            'x': coords['x'],
+            'y': coords['y'],
+            'style': element.get_attribute('style') or ''
+        }
+
+    @classmethod
+    def parse_attribute(cls, style_str):
         attr_dict = {}
+        if not style_str:
+            return attr_dict
+        style_list = style_str.split(';')
         for item in style_list:
-            key, value = item.split(': ')
-            attr_dict[key] = value
+            if ':' not in item:
+                continue
+            key, value = item.split(':', 1)
+            key = key.strip()
+            if key in cls.USED_STYLES:
+                attr_dict[key] = value.strip()
         return attr_dict
 
 class Event:
+    __slots__ = ('act', 'place', 'start', 'stop', 'info')
+
     def __init__(self, act, place, start_obj, stop_obj, info=''):
         self.act = act
         self.place = place
@@ -82,6 +208,19 @@ class Event:
             )
         )
 
+    @property
+    def slot(self):
+        """Identifies the lesson, start, stop and title"""
+
+        return '|'.join((self.start.strftime('%Y-%m-%dT%H:%M'), self.stop.strftime('%Y-%m-%dT%H:%M'), self.act))
+
+    @property
+    def key(self):
+        """Stable hash of the event's content, changes if any attribute changes"""
+
+        content = '\x1f'.join((self.slot, self.place, self.info))
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
     @property
     def dict_(self):
         return {
@@ -102,7 +241,104 @@ class Event:
             dict_['info']
         )
 
+class EventTable:
+    """
+    Many events stored as parallel arrays, instead of one object per event
+    start and stop are seconds since EPOCH, act, place and info are indexes into a table of unique strings
+    iterating yields Event objects
+    """
+
+    EPOCH = JsonDateTime(1970, 1, 1)
+
+    def __init__(self, events=()):
+        self.starts = array('d')
+        self.stops = array('d')
+        self.acts = array('L')
+        self.places = array('L')
+        self.infos = array('L')
+        self.strings = []
+        self.string_idxs = {}
+        self.extend(events)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getitem__(self, idx):
+        strings = self.strings
+        return Event(
+            strings[self.acts[idx]],
+            strings[self.places[idx]],
+            self.EPOCH + timedelta(seconds=self.starts[idx]),
+            self.EPOCH + timedelta(seconds=self.stops[idx]),
+            strings[self.infos[idx]]
+        )
+
+    def __iadd__(self, events):
+        self.extend(events)
+        return self
+
+    def intern(self, string):
+        idx = self.string_idxs.get(string)
+        if idx is None:
+            idx = self.string_idxs[string] = len(self.strings)
+            self.strings.append(sys.intern(string))
+        return idx
+
+    def append(self, event):
+        if event.start.tzinfo is not None or event.stop.tzinfo is not None:
+            raise ValueError('EventTable only stores naive datetimes')
+        self.starts.append((event.start - self.EPOCH).total_seconds())
+        self.stops.append((event.stop - self.EPOCH).total_seconds())
+        self.acts.append(self.intern(event.act))
+        self.places.append(self.intern(event.place))
+        self.infos.append(self.intern(event.info))
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+
 class Schedule:
+    # textbox count, box count and the text of the first and last textbox
+    SIGNATURE_SCRIPT = """
+        var textboxes = document.getElementsByClassName('textBox');
+        var boxes = document.getElementsByClassName('box');
+        return [
+            textboxes.length,
+            boxes.length,
+            textboxes.length ? textboxes[0].innerText : '',
+            textboxes.length ? textboxes[textboxes.length - 1].innerText : ''
+        ];
+    """
+
+    # calls back with true once there are textboxes and no mutations for arguments[0] ms,
+    # or with false after arguments[1] ms
+    RENDER_SCRIPT = """
+        var quiet = arguments[0], timeout = arguments[1], done = arguments[arguments.length - 1];
+        var timer = null, finished = false;
+        function finish(result) {
+            if (finished) return;
+            finished = true;
+            observer.disconnect();
+            done(result);
+        }
+        function restart() {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                if (document.getElementsByClassName('textBox').length) finish(true);
+                else restart();
+            }, quiet);
+        }
+        var observer = new MutationObserver(restart);
+        observer.observe(document.body, {childList: true, subtree: true, attributes: true, characterData: true});
+        setTimeout(function () { finish(false); }, timeout);
+        restart();
+    """
+
     def __init__(self, events, date_created, days_updated):
         self.date_created = date_created
         self.days_updated = days_updated
@@ -123,6 +359,22 @@ class Schedule:
     def __len__(self):
         return len(self.schedule)
 
+    def compact(self):
+        """Return a Schedule with the events stored in an EventTable"""
+
+        if isinstance(self.schedule, EventTable):
+            return self
+        return Schedule(EventTable(self.schedule), self.date_created, self.days_updated)
+
+    def normalize(self):
+        """
+        Return (Schedule, Normalized), the schedule with its events sorted, duplicates dropped
+        and split lessons merged, see normalize.py
+        """
+
+        normalized = Normalized.from_events(self)
+        return Schedule(normalized.events, self.date_created, self.days_updated), normalized
+
     @classmethod
     def from_selenium(cls, username, password):
         dt = JsonDateTime.now()
@@ -148,141 +400,255 @@ class Schedule:
         }
 
 
-    def save_csv(self):
+    def save_csv(self, path='schedule.csv'):
         """
         Save schedule to csv
         used for importing schedule into google calendar, instead of using api
         """
 
-        if os.path.exists('schedule.csv'):
-            os.remove('schedule.csv')
-        with open('schedule.csv', 'w', newline='') as schedule:
-            writer = csv.writer(schedule)
-            writer.writerow(['Subject', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Location'])
-            for act in self.schedule:
-                start_date = act.start.strftime('%m/%d/%Y')
-
-                start_time = act.start.strftime('%I:%M %p')
-                start_time = start_time.upper()
-                if start_time[0] == '0':
-                    start_time = start_time[1:]
-
-                end_date = act.stop.strftime('%m/%d/%Y')
-
-                end_time = act.stop.strftime('%I:%M %p')
-                end_time = end_time.upper()
-                if end_time[0] == '0':
-                    end_time = end_time[1:]
-
-                writer.writerow(
-                    [
-                        act.act,
-                        start_date,
-                        start_time,
-                        end_date,
-                        end_time,
-                        act.place
-                    ]
-                )
+        export(self.normalize()[0], path, 'csv')
+
+    def save_ics(self, path='schedule.ics'):
+        """Save schedule as an iCalendar file, for importing without using the api"""
+
+        export(self.normalize()[0], path, 'ics')
 
     @classmethod
     def get_schedule(cls, user_name, user_password, dt):
+        browser = cls.start_browser()
+        cls.login(browser, user_name, user_password)
+        school_names = cls.get_dropdown_options(browser.find_element_by_id('school'))
+        chosen_school = cls.choose_dropdown_option(school_names)
+        url = cls.open_school(browser, chosen_school)
+
+        while True:
+            for sche_type in SCHE_TYPES:
+                print(sche_type)
+            sche_type = input('choose sche_type: ')
+            if sche_type in SCHE_TYPES:
+                break
+
+        if sche_type == 'personal id':
+            chosen_schedule = input('personal id: ')
+        else:
+            schedule_choices = cls.get_dropdown_options(browser.find_element_by_id(DROP_DOWN_ID[sche_type]))
+            chosen_schedule = cls.choose_dropdown_option(schedule_choices)
+
+        current_week = dt.isocalendar()[1]
+        weeks = input(f'weeks, like 34 or 34-36 (empty for week {current_week}): ')
+        weeks = cls.parse_weeks(weeks) if weeks.strip() else [current_week]
+
+        schedule, days_updated = cls.get_weeks(browser, chosen_school, sche_type, chosen_schedule, weeks, dt)
+        browser.close()
+        return schedule, days_updated
+
+    @classmethod
+    def get_weeks(cls, browser, school, sche_type, schedule_id, weeks, dt):
+        """
+        Scrape weeks of one schedule without asking the user anything
+        browser has to be logged in already, see login
+
+        :param sche_type: str, one of SCHE_TYPES
+        :param schedule_id: str, the dropdown entry, or the signature if sche_type is 'personal id'
+        :param weeks: iterable of int, week numbers
+        :return: tuple, (list of Event, list of days updated)
+        """
+
+        schedule, days_updated, _ = cls.get_changed_weeks(browser, school, sche_type, schedule_id, weeks, dt)
+        return schedule, days_updated
+
+    @classmethod
+    def get_changed_weeks(cls, browser, school, sche_type, schedule_id, weeks, dt, cache=None):
+        """
+        Same as get_weeks, weeks that haven't changed since they were put in cache are left out
+        cache isn't updated here, put the changes in it once their events are saved or synced,
+        so a week that fails downstream is scraped again
+
+        :param cache: weekcache.WeekCache
+        :return: tuple, (list of Event, list of days updated, list of (key, fingerprint, events, days updated)
+            for cache.put, one per changed week)
+        """
+
+        if sche_type not in SCHE_TYPES:
+            raise ValueError(f'unknown schedule type: {sche_type}')
+        schedule = []
+        days_updated = []
+        changes = []
+        for week in weeks:
+            cls.open_week(browser, school, sche_type, schedule_id, week)
+            raw = SnappyElement.raw_snapshot(browser, ('textBox', 'box'))
+            if cache is not None:
+                key = cache.key(school, sche_type, schedule_id, dt.year, week)
+                fingerprint = cache.fingerprint(raw)
+                if cache.unchanged(key, fingerprint):
+                    continue
+            new_sche, new_updated = cls.parse_raw(raw, dt)
+            cls.check_week(new_updated, week)
+            if cache is not None:
+                changes.append((key, fingerprint, new_sche, new_updated))
+            schedule += new_sche
+            days_updated += new_updated
+
+        normalized = Normalized.from_events(schedule)
+        count('duplicate events', normalized.duplicates)
+        count('merged events', normalized.merges)
+        count('overlapping events', len(normalized.overlaps))
+        return normalized.events, days_updated, changes
+
+    @classmethod
+    def open_week(cls, browser, school, sche_type, schedule_id, week):
+        if sche_type == 'personal id':
+            browser.get(cls.week_url(cls.school_url(school), week))
+            cls.wait_until_loaded(browser)
+            cls.enter_signature(browser, schedule_id)
+        else:
+            browser.get(cls.week_url(cls.schedule_url(school, sche_type, schedule_id), week))
+        cls.wait_for_render(browser)
+
+    @classmethod
+    @timed('wait for render')
+    def wait_for_render(cls, browser, timeout=RENDER_TIMEOUT):
+        """
+        Wait until the timetable has textboxes and has stopped changing for RENDER_QUIET_MS
+        uses a MutationObserver, falls back to polling the element counts if async scripts don't work
+        """
+
+        from selenium.common.exceptions import WebDriverException, TimeoutException
+
+        browser.set_script_timeout(timeout + RENDER_SCRIPT_MARGIN)
+        try:
+            rendered = browser.execute_async_script(cls.RENDER_SCRIPT, RENDER_QUIET_MS, timeout * 1000)
+        except WebDriverException:
+            rendered = cls.poll_render(browser, timeout)
+        if not rendered:
+            raise TimeoutException(f'timetable didn\'t render in {timeout}s')
+
+    @classmethod
+    def poll_render(cls, browser, timeout):
+        """Return True once the DOM signature is the same twice in a row, with textboxes in it"""
+
+        deadline = time.monotonic() + timeout
+        last = None
+        while time.monotonic() < deadline:
+            signature = browser.execute_script(cls.SIGNATURE_SCRIPT)
+            if signature == last and signature[0]:
+                return True
+            last = signature
+            time.sleep(RENDER_QUIET_MS / 1000)
+        return False
+
+    @staticmethod
+    def parse_weeks(weeks):
+        """
+        :param weeks: int, list of int or str like '34-36'
+        :return: list of int
+        """
+
+        if isinstance(weeks, int):
+            return [weeks]
+        if isinstance(weeks, str):
+            first, _, last = weeks.partition('-')
+            return list(range(int(first), int(last or first) + 1))
+        return [int(week) for week in weeks]
+
+    @staticmethod
+    def check_week(days_updated, week):
+        """Raise ValueError if the parsed days aren't in week, the site shows the current week for unknown urls"""
+
+        for day in days_updated:
+            if day.isocalendar()[1] != week:
+                raise ValueError(f'expected week {week}, got {day.strftime("%Y/%m/%d")}')
+
+    @staticmethod
+    @timed('launch driver')
+    def start_browser(headless=False):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+
         options = ChromeOptions()
         options_args = (
             '--headless',
-            '--no - sandbox',
+            '--no-sandbox',
             '--disable-gpu',  # nescessary on windows systems if '--headless' is option
-            '--window-size=1920x1080'  # TextBoxes get weird without this
+            '--window-size=1920,1080'  # TextBoxes get weird without this
         )
-        # for option in options_args:
-        #     options.add_argument(option)
-        browser = webdriver.Chrome('chromedriver.exe', options=options)
-
-        # initial url is for login site
-        # base_url is for joining with school
-        url = 'https://login001.stockholm.se/siteminderagent/forms/loginForm.jsp?SMAGENTNAME=login001-ext.stockholm' \
-              '.se&POSTTARGET=https://login001.stockholm.se/NECSedu/form/b64startpage.jsp?startpage' \
-              '=aHR0cHM6Ly9mbnMuc3RvY2tob2xtLnNlL25nL3RpbWV0YWJsZS90aW1ldGFibGUtdmlld2VyL2Zucy5zdG9ja2hvbG0uc2Uv' \
-              '&TARGET=-SM-https://fns.stockholm.se/ng/timetable/timetable-viewer/fns.stockholm.se/ '
-        base_url = 'https://fns.stockholm.se/ng/timetable/timetable-viewer/fns.stockholm.se/'
-        browser.get(url)
+        if headless:
+            for option in options_args:
+                options.add_argument(option)
+        # every call through the driver is counted in the run's report
+        return CountedDriver(webdriver.Chrome('chromedriver.exe', options=options))
 
-        # Login
+    @classmethod
+    @timed('login')
+    def login(cls, browser, user_name, user_password):
+        browser.get(LOGIN_URL)
         browser.find_element_by_name('user').send_keys(user_name)
         browser.find_element_by_name('password').send_keys(user_password)
         browser.find_element_by_name('submit').click()
-        WebDriverWait(browser, 10).until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'k-input')))
-        school_names = cls.get_dropdown_options(browser.find_element_by_id('school'))
-        chosen_school = cls.choose_dropdown_option(school_names)
-        url = base_url + chosen_school + '/'
-        quote(url)
+        cls.wait_until_loaded(browser)
+
+    @classmethod
+    def open_school(cls, browser, school):
+        url = cls.school_url(school)
         browser.get(url)
+        cls.wait_until_loaded(browser)
+        return url
+
+    @staticmethod
+    def enter_signature(browser, user_id):
+        id_input = browser.find_element_by_id('signatures')
+        id_input.click()
+        id_input.send_keys(user_id)
+        browser.find_element_by_id('signatures-button').click()
+
+    @staticmethod
+    def wait_until_loaded(browser):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
 
-        # Wait until site is loaded
         WebDriverWait(browser, 10).until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'k-input')))
 
-        sche_types = (
-            'class',
-            'personal id',
-            'room',
-            'teacher',
-            'subject'
-        )
-        while True:
-            for sche_type in sche_types:
-                print(sche_type)
-            sche_type = input('choose sche_type: ')
-            if sche_type in sche_types:
-                break
+    @staticmethod
+    def school_url(school):
+        return BASE_URL + quote(school) + '/'
 
-        if sche_type == 'personal id':
-            user_id = input('personal id: ')
-            id_input = browser.find_element_by_id('signatures')
-            id_input.click()
-            id_input.send_keys(user_id)
-            browser.find_element_by_id('signatures-button').click()
-        else:
-            drop_down_id = {
-                'class': 'classDropDown',
-                'room': 'roomDropDown',
-                'teacher': 'teacherDropDown',
-                'subject': 'subjectDropDown'
-            }
+    @classmethod
+    def schedule_url(cls, school, sche_type, schedule_id):
+        return cls.school_url(school) + quote(sche_type) + '/' + quote(schedule_id)
 
-            schedule_choices = cls.get_dropdown_options(browser.find_element_by_id(drop_down_id[sche_type]))
-            chosen_schedule = cls.choose_dropdown_option(schedule_choices)
-            url += sche_type + '/' + chosen_schedule
-            quote(url)
-            browser.get(url)
+    @staticmethod
+    def week_url(url, week):
+        return url.rstrip('/') + '/' + WEEK_PATH.format(week=week)
 
-        schedule = []
-        days_updated = []
-        while True:
-            input('choose a week in the browser and press enter to resume')
-            WebDriverWait(browser, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'textBox')))
-            new_sche, new_updated = cls.parse(browser, dt)
-            schedule += (new_sche)
-            days_updated += (new_updated)
-            if input('Add another week? (y/n): ').lower() == 'n':
-                break
-        browser.close()
-        return schedule, days_updated
+    @classmethod
+    def parse(cls, selenium, dt, engine='python'):
+        return cls.parse_raw(SnappyElement.raw_snapshot(selenium, ('textBox', 'box')), dt, engine)
 
     @classmethod
-    def parse(cls, selenium, dt):
+    def parse_raw(cls, raw, dt, engine='python'):
+        """Parse a snapshot from SnappyElement.raw_snapshot"""
+
+        textboxes = [SnappyElement.from_dict(dict_) for dict_ in raw['textBox']]
+        boxes = [SnappyElement.from_dict(dict_) for dict_ in raw['box']]
+        return cls.parse_elements(textboxes, boxes, dt, engine)
+
+    @classmethod
+    @timed('parse')
+    def parse_elements(cls, textboxes, boxes, dt, engine='python'):
+        """
+        :param textboxes: list of SnappyElement, the page's textBox elements
+        :param boxes: list of SnappyElement, the page's box elements
+        :param dt: datetime, year of the schedule
+        :param engine: str, 'python' or 'numpy', see match_boxes, or a function like match_boxes
+        :return: tuple, (list of Event, list of days updated)
+        """
+
         year = dt.year
         allowed_timestamp_characters = digits + ':'
 
-        # clrs that boxes representing events don't have
-        non_class_clrs = (
-            (0, 0, 0),
-            (204, 204, 204),
-            (211, 211, 211)
-        )
-
         #TODO 34 is 36 in my schedule, depends on how many timestamps are in the peripheral
-        textboxes = [SnappyElement(element) for element in track(selenium.find_elements_by_class_name('textBox'), description='getting textboxes from website') if element.text]
-        boxes = list(map(SnappyElement, track(selenium.find_elements_by_class_name('box'), description='getting boxes from website')))
+        textboxes = [element for element in textboxes if element.text]
         day_textboxes = [box for box in textboxes if '/' in box.text and 'dag' in box.text]
         day_boxes = boxes[2:7]
 
@@ -317,12 +683,42 @@ class Schedule:
             else:
                 attributes.append(element)
 
-        # TODO fix
-        # Get fontsize for timestamps
-        for element in textboxes:
-            if ':' in element.text and all(char in allowed_timestamp_characters for char in element.text):
-                font_size = float(element.style['font-size'][:-2])
-                break
+        if callable(engine):
+            match_boxes = engine
+        elif engine == 'numpy':
+            import layout_np  # numpy is optional
+            match_boxes = layout_np.match_boxes
+        else:
+            match_boxes = cls.match_boxes
+        matches = match_boxes(days, day_width, timestamps, attributes, boxes)
+
+        events = []
+        for start, stop, local_attributes in matches:
+            if len(local_attributes) == 3:
+                event, teacher, location = [attribute.text for attribute in local_attributes]
+            elif local_attributes:
+                event = local_attributes[0].text
+                teacher = ''
+                location = ''
+            else:
+                event = ''
+                teacher = ''
+                location = ''
+            events.append(Event(event, location, start, stop, teacher))
+
+        days_updated = []
+        for day in days:
+            month, day = day['date']
+            days_updated.append(JsonDateTime(year, month, day))
+        return events, days_updated
+
+
+    @staticmethod
+    def match_boxes(days, day_width, timestamps, attributes, boxes):
+        """
+        Yield (start, stop, attributes inside) for each box that represents an event
+        layout_np.match_boxes does the same with numpy
+        """
 
         # get boxes that represent events
         class_boxes = []
@@ -331,11 +727,13 @@ class Schedule:
                 clr_str = box.style['background-color'][4:-1]
                 clr = clr_str.split(', ')
                 clr = tuple([int(num) for num in clr])
-                if clr not in non_class_clrs:
+                if clr not in NON_CLASS_CLRS:
                     class_boxes.append(box)
 
         # Get start, stop attributes for each event
-        events = []
+        # start is the last timestamp above the box in its day column,
+        # stop is the last one above the box's lower edge and right of the box's left edge
+        index = LayoutIndex(days, day_width, timestamps, attributes)
         for box in class_boxes:
             box_coords = box.coords
             box_style_dict = box.style
@@ -343,48 +741,15 @@ class Schedule:
             height = int(box_style_dict['height'][:-2])
             corner = Coords(box_coords.x + width, box_coords.y + height)
 
-            for day in days[::-1]:
-                day_coords = day['coords']
-                if box_coords >= day_coords:
-                    break
-
+            day_idx = index.day_index(box_coords)
 
             # TODO check for conflict
             # get start and stop datetime
-            start, stop = False, False
-            for stamp in timestamps:
-                stamp_coords = stamp['coords']
-                if stamp_coords.y < box_coords.y < box_coords.y + font_size\
-                and day_coords.x < stamp_coords.x < day_coords.x + day_width:
-                    start = stamp['datetime']
-                if stamp_coords.y < corner.y < corner.y + font_size\
-                and box_coords.x < stamp_coords.x < day_coords.x + day_width:
-                    stop = stamp['datetime']
+            start = index.start(day_idx, box_coords)
+            stop = index.stop(day_idx, box_coords, corner)
             if start and stop:
                 # TODO delete attributes that are local from global
-                local_attributes = []
-                for attribute in attributes:
-                    if box_coords < attribute.coords < corner:
-                        local_attributes.append(attribute)
-
-                if len(local_attributes) == 3:
-                    event, teacher, location = [attribute.text for attribute in local_attributes]
-                elif local_attributes:
-                    event = local_attributes[0].text
-                    teacher = ''
-                    location = ''
-                else:
-                    event = ''
-                    teacher = ''
-                    location = ''
-                events.append(Event(event, location, start, stop, teacher))
-
-        days_updated = []
-        for day in days:
-            month, day = day['date']
-            days_updated.append(JsonDateTime(year, month, day))
-        return events, days_updated
-
+                yield start, stop, index.attributes_inside(box_coords, corner)
 
     @staticmethod
     def make_date(element):
@@ -423,31 +788,29 @@ class Schedule:
         :return: list, textcontent of element's options
         """
 
+        from selenium.webdriver.support.ui import Select
+
         element = Select(element)
         schools = element.options
         options = [school.get_property('textContent') for school in schools[1:]]  # [0] is the placeholder value
         return options
 
 
-def main(username, password):
+def main(username, password, path='schedule.jsonl'):
+    import storage  # storage imports this module
     mysche = Schedule.from_selenium(username, password)
-    with open('schedule.json', 'w') as file:
-        json.dump(mysche.dict_, file, indent=4)
+    storage.save(mysche, path)
+    return mysche
 
 
 if __name__ == '__main__':
-    mysche = Schedule.from_selenium('ab61274', getpass('pass: '))
-    with open('schedule.json', 'w') as file:
-        json.dump(mysche.dict_, file, indent=True)
-    # with open('schedule.json', 'r') as file:
-    #     mysche = Schedule.from_dict(json.load(file))
-    #     pprint(mysche.dict_)
-    #     print('\n'*5, print(len(mysche)))
+    main('ab61274', getpass('pass: '))
+    # mysche = storage.load('schedule.jsonl')
+    # pprint(mysche.dict_)
+    # print('\n'*5, print(len(mysche)))
 
 # TODO handle if user chooses schedule_type that isn't avalible
 # TODO handle events without location or simular: could be made by bundling elements by coordinates
-# TODO add multiple week functionality
-# TODO if two lessons are besides each other, one might end when the other one starts !!!
 # TODO logging
 # TODO maybe make __init__ generator
 # TODO comment and document
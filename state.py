@@ -0,0 +1,162 @@
+"""
+Local record of what has been pushed to google calendar
+maps each synced Event's content key to its google event id and etag, indexed by calendar and day,
+so a sync can be planned without listing the calendar, which only has to be done now and then to reconcile
+"""
+
+import os
+import sqlite3
+import time
+
+STATE_PATH = os.path.join('.cache', 'state.sqlite3')
+# how often the store is checked against the calendar, in seconds
+RECONCILE_INTERVAL = 7 * 24 * 60 * 60
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    key TEXT,
+    slot TEXT,
+    etag TEXT,
+    day TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_by_day ON events (calendar_id, day);
+CREATE TABLE IF NOT EXISTS reconciled_days (
+    calendar_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    reconciled_at REAL NOT NULL,
+    PRIMARY KEY (calendar_id, day)
+);
+'''
+
+
+class StateStore:
+    def __init__(self, path=STATE_PATH, check_same_thread=True):
+        """:param check_same_thread: bool, False lets the store be closed from another thread than the one using it"""
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def day(event):
+        """Local date of a google event's start, 'yyyy-mm-dd'"""
+
+        return event['start']['dateTime'][:10]
+
+    def events_on_days(self, calendar_id, days):
+        """
+        Return the stored events on days, shaped like the google event json SyncPlan.from_events takes
+
+        :param days: iterable of datetime
+        """
+
+        days = sorted({day.strftime('%Y-%m-%d') for day in days})
+        if not days:
+            return []
+        rows = self.connection.execute(
+            f'SELECT event_id, key, slot, etag FROM events '
+            f'WHERE calendar_id = ? AND day IN ({", ".join("?" * len(days))})',
+            [calendar_id] + days
+        )
+        return [
+            {
+                'id': event_id,
+                'etag': etag,
+                'extendedProperties': {'private': self.private(key, slot)}
+            }
+            for event_id, key, slot, etag in rows
+        ]
+
+    @staticmethod
+    def private(key, slot):
+        from gcal import KEY_PROPERTY, SLOT_PROPERTY
+
+        private = {}
+        if key is not None:
+            private[KEY_PROPERTY] = key
+        if slot is not None:
+            private[SLOT_PROPERTY] = slot
+        return private
+
+    def put(self, calendar_id, events, synced_at=None):
+        """Store google events, from insert or patch responses or a list, in one transaction"""
+
+        from gcal import KEY_PROPERTY, SLOT_PROPERTY
+
+        synced_at = synced_at or time.time()
+        rows = []
+        for event in events:
+            private = event.get('extendedProperties', {}).get('private', {})
+            rows.append((
+                calendar_id,
+                event['id'],
+                private.get(KEY_PROPERTY),
+                private.get(SLOT_PROPERTY),
+                event.get('etag'),
+                self.day(event),
+                synced_at
+            ))
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO events (calendar_id, event_id, key, slot, etag, day, synced_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+
+    def delete(self, calendar_id, event_ids):
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM events WHERE calendar_id = ? AND event_id = ?',
+                [(calendar_id, event_id) for event_id in event_ids]
+            )
+
+    def needs_reconcile(self, calendar_id, days, interval=RECONCILE_INTERVAL):
+        """True if any of days hasn't been listed from the calendar in the last interval seconds"""
+
+        days = sorted({day.strftime('%Y-%m-%d') for day in days})
+        if not days:
+            return False
+        (reconciled,) = self.connection.execute(
+            f'SELECT COUNT(*) FROM reconciled_days '
+            f'WHERE calendar_id = ? AND reconciled_at > ? AND day IN ({", ".join("?" * len(days))})',
+            [calendar_id, time.time() - interval] + days
+        ).fetchone()
+        return reconciled < len(days)
+
+    def reconcile(self, calendar_id, days, cal_events):
+        """Replace what is stored for days with cal_events, listed from the calendar"""
+
+        days = sorted({day.strftime('%Y-%m-%d') for day in days})
+        now = time.time()
+        with self.connection:
+            if days:
+                self.connection.execute(
+                    f'DELETE FROM events WHERE calendar_id = ? AND day IN ({", ".join("?" * len(days))})',
+                    [calendar_id] + days
+                )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO reconciled_days (calendar_id, day, reconciled_at) VALUES (?, ?, ?)',
+                [(calendar_id, day, now) for day in days]
+            )
+        self.put(calendar_id, cal_events, now)
+
+    def forget(self, calendar_id):
+        """Drop everything stored for a calendar, when it was deleted"""
+
+        with self.connection:
+            self.connection.execute('DELETE FROM events WHERE calendar_id = ?', (calendar_id,))
+            self.connection.execute('DELETE FROM reconciled_days WHERE calendar_id = ?', (calendar_id,))
@@ -0,0 +1,133 @@
+"""
+Reading and writing schedules to disk
+
+.jsonl (default): one json line with the schedule's info, then one line per event
+    {"format": 1, "created": "2026-08-17T10:00:00", "days updated": ["2026-08-17T00:00:00", ...]}
+    ["title", "location", "2026-08-17T08:10:00", "2026-08-17T09:10:00", "info"]
+.msgpack: the same records packed with msgpack, needs the msgpack package
+.json: the old nested dict format from Schedule.dict_, read and written for compatibility
+"""
+
+from scraper import Schedule, Event
+from JsonDateTime import JsonDateTime
+from instrument import timed
+
+import json
+import os
+
+FORMAT_VERSION = 1
+
+
+def header(schedule):
+    return {
+        'format': FORMAT_VERSION,
+        'created': schedule.date_created.isoformat(),
+        'days updated': [day.isoformat() for day in schedule.days_updated]
+    }
+
+
+def event_record(event):
+    return [event.act, event.place, event.start.isoformat(), event.stop.isoformat(), event.info]
+
+
+def event_from_record(record):
+    act, place, start, stop, info = record
+    return Event(act, place, JsonDateTime.fromisoformat(start), JsonDateTime.fromisoformat(stop), info)
+
+
+def file_format(path):
+    return os.path.splitext(path)[1].lstrip('.') or 'jsonl'
+
+
+@timed('save schedule')
+def save(schedule, path):
+    """Write schedule to path, the format is picked from the extension"""
+
+    format_ = file_format(path)
+    tmp_path = path + '.tmp'
+    if format_ == 'json':
+        with open(tmp_path, 'w') as file:
+            json.dump(schedule.dict_, file)
+    elif format_ == 'msgpack':
+        msgpack = import_msgpack()
+        with open(tmp_path, 'wb') as file:
+            packer = msgpack.Packer()
+            file.write(packer.pack(header(schedule)))
+            for event in schedule:
+                file.write(packer.pack(event_record(event)))
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(header(schedule), ensure_ascii=False) + '\n')
+            file.writelines(json.dumps(event_record(event), ensure_ascii=False) + '\n' for event in schedule)
+    os.replace(tmp_path, path)
+
+
+@timed('load schedule')
+def load(path):
+    """Read a Schedule from path, written by save or the old json format"""
+
+    if file_format(path) == 'json':
+        with open(path, 'r') as file:
+            return Schedule.from_dict(json.load(file))
+    info, records = read_records(path)
+    with records:
+        events = [event_from_record(record) for record in records]
+    return Schedule(
+        events,
+        JsonDateTime.fromisoformat(info['created']),
+        [JsonDateTime.fromisoformat(day) for day in info['days updated']]
+    )
+
+
+def iter_events(path):
+    """Yield the events in path one at a time, without loading the whole schedule"""
+
+    if file_format(path) == 'json':
+        yield from load(path)
+        return
+    info, records = read_records(path)
+    with records:
+        for record in records:
+            yield event_from_record(record)
+
+
+def read_records(path):
+    """Return (info dict, Records), Records yields the event records and closes the file"""
+
+    if file_format(path) == 'msgpack':
+        msgpack = import_msgpack()
+        file = open(path, 'rb')
+        unpacker = msgpack.Unpacker(file, raw=False)
+        info = next(unpacker)
+        records = unpacker
+    else:
+        file = open(path, 'r', encoding='utf-8')
+        info = json.loads(file.readline())
+        records = (json.loads(line) for line in file if line.strip())
+    if info.get('format') != FORMAT_VERSION:
+        file.close()
+        raise ValueError(f'{path}: unknown schedule format {info.get("format")}')
+    return info, Records(file, records)
+
+
+class Records:
+    def __init__(self, file, records):
+        self.file = file
+        self.records = records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+def import_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError('the .msgpack format needs msgpack, pip install msgpack') from None
+    return msgpack
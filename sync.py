@@ -0,0 +1,227 @@
+"""
+Incremental calendar sync
+compares scraped events with the events already in the calendar and only sends the calls that are needed,
+instead of deleting every event on the updated days and adding them again
+"""
+
+from gcal import (
+    event_body, execute_batch, load_credentials, get_service, get_cal_id, forget_cal_id, calendar_exists,
+    get_events_by_dts, print_errors, HttpError, KEY_PROPERTY, SLOT_PROPERTY
+)
+from state import StateStore, STATE_PATH
+from instrument import timer, timed
+import storage
+
+from contextlib import nullcontext
+
+
+class SyncPlan:
+    def __init__(self, inserts, patches, deletes, unchanged):
+        """
+        :param inserts: list of Event, not in the calendar
+        :param patches: list of (event id, Event), same lesson as a calendar event but different content
+        :param deletes: list of event ids, calendar events that weren't scraped
+        :param unchanged: int, events that are already in the calendar
+        """
+
+        self.inserts = inserts
+        self.patches = patches
+        self.deletes = deletes
+        self.unchanged = unchanged
+
+    def __str__(self):
+        return f'{len(self.inserts)} to add, {len(self.patches)} to update, ' \
+               f'{len(self.deletes)} to delete, {self.unchanged} unchanged'
+
+    def __len__(self):
+        return len(self.inserts) + len(self.patches) + len(self.deletes)
+
+    @classmethod
+    def from_events(cls, act_objs, cal_events):
+        """
+        :param act_objs: iterable of Event, the scraped events
+        :param cal_events: list of google event json, the calendar's events on the updated days
+        """
+
+        # scraped events by content key, a list since a lesson can be scraped twice
+        scraped = {}
+        for act_obj in act_objs:
+            scraped.setdefault(act_obj.key, []).append(act_obj)
+
+        # calendar events whose content matches a scraped event are left alone
+        unmatched = []
+        unchanged = 0
+        for cal_event in cal_events:
+            private = cal_event.get('extendedProperties', {}).get('private', {})
+            matches = scraped.get(private.get(KEY_PROPERTY))
+            if matches:
+                matches.pop()
+                unchanged += 1
+            else:
+                unmatched.append((private.get(SLOT_PROPERTY), cal_event['id']))
+
+        # what is left either updates a calendar event in the same slot or is new
+        by_slot = {}
+        deletes = []
+        for slot, event_id in unmatched:
+            if slot is None:
+                # events from before keys were stored are replaced
+                deletes.append(event_id)
+            else:
+                by_slot.setdefault(slot, []).append(event_id)
+
+        inserts = []
+        patches = []
+        for matches in scraped.values():
+            for act_obj in matches:
+                event_ids = by_slot.get(act_obj.slot)
+                if event_ids:
+                    patches.append((event_ids.pop(), act_obj))
+                else:
+                    inserts.append(act_obj)
+        for event_ids in by_slot.values():
+            deletes += event_ids
+        return cls(inserts, patches, deletes, unchanged)
+
+    @timed('sync')
+    def apply(self, serv_obj, cal_id, store=None, throttle=None):
+        """
+        Send the plan to the calendar, return errors as (description, HttpError)
+
+        :param store: StateStore, updated with the events that were added, updated or deleted as each batch completes
+        :param throttle: passed on to execute_batch
+        """
+
+        events = serv_obj.events()
+        requests = []
+        descriptions = []
+        for event_id in self.deletes:
+            requests.append(events.delete(calendarId=cal_id, eventId=event_id))
+            descriptions.append(f'delete {event_id}')
+        for event_id, act_obj in self.patches:
+            requests.append(events.patch(calendarId=cal_id, eventId=event_id, body=event_body(act_obj)))
+            descriptions.append(f'update {act_obj.slot}')
+        for act_obj in self.inserts:
+            requests.append(events.insert(calendarId=cal_id, body=event_body(act_obj)))
+            descriptions.append(f'add {act_obj.slot}')
+
+        if not requests:
+            return []
+        on_chunk = None
+        if store is not None:
+            def on_chunk(indices, responses):
+                self.record(store, cal_id, indices, responses)
+        responses, errors = execute_batch(serv_obj, requests, throttle=throttle, on_chunk=on_chunk)
+        if store is not None:
+            self.forget_gone(store, cal_id, errors)
+        return [(descriptions[idx], error) for idx, error in errors]
+
+    def record(self, store, cal_id, indices, responses):
+        """Write the requests at indices in apply's order that went through to store"""
+
+        offset = len(self.deletes)
+        done = [idx for idx in indices if responses[idx] is not None]
+        store.delete(cal_id, [self.deletes[idx] for idx in done if idx < offset])
+        store.put(cal_id, [responses[idx] for idx in done if idx >= offset])
+
+    def forget_gone(self, store, cal_id, errors):
+        """Drop events the store knew of that are gone from the calendar, deleted or edited by hand"""
+
+        offset = len(self.deletes)
+        store.delete(cal_id, [
+            self.deletes[idx] if idx < offset else self.patches[idx - offset][0]
+            for idx, error in errors
+            if idx < offset + len(self.patches) and is_gone(error)
+        ])
+
+
+def is_gone(error):
+    return isinstance(error, HttpError) and error.resp.status in (404, 410)
+
+
+def calendar_events(serv_obj, store, cal_id, days, reconcile=False, dry_run=False):
+    """
+    Return the calendar's events on days, as SyncPlan.from_events takes them
+    read from store, the calendar is only listed if a day is due to be reconciled or reconcile is True
+    """
+
+    if reconcile or store.needs_reconcile(cal_id, days):
+        with timer('list events'):
+            cal_events = get_events_by_dts(serv_obj, cal_id, days)
+        if not dry_run:
+            store.reconcile(cal_id, days, cal_events)
+        return cal_events
+    with timer('read state'):
+        return store.events_on_days(cal_id, days)
+
+
+def sync_events(serv_obj, store, summary, cal_id, events, days, reconcile=False, dry_run=False, throttle=None,
+                cal_ids=None, lock=None):
+    """
+    Plan a sync of events on days to the calendar with summary and apply it
+    cal_id can be cached and outlive its calendar, if the calendar is gone the id is resolved again,
+    which creates a new calendar, and the sync is retried once
+
+    :param cal_ids: passed on to get_cal_id
+    :param lock: held while the calendar is replaced, so threads syncing to it don't each create one
+    :return: tuple, (calendar id, SyncPlan, errors as (description, HttpError))
+    """
+
+    for attempt in range(2):
+        try:
+            cal_events = calendar_events(serv_obj, store, cal_id, days, reconcile, dry_run)
+        except HttpError as error:
+            if attempt or not is_gone(error):
+                raise
+            if dry_run:
+                # don't create a calendar in a dry run, everything would be added
+                return cal_id, SyncPlan.from_events(events, []), []
+            cal_id = replace_calendar(serv_obj, store, summary, cal_id, cal_ids, lock)
+            continue
+        plan = SyncPlan.from_events(events, cal_events)
+        if dry_run:
+            return cal_id, plan, []
+        errors = plan.apply(serv_obj, cal_id, store, throttle)
+        # the plan came from the store, so a deleted calendar only shows as calls that 404
+        if attempt or not any(is_gone(error) for _, error in errors) or calendar_exists(serv_obj, cal_id):
+            return cal_id, plan, errors
+        cal_id = replace_calendar(serv_obj, store, summary, cal_id, cal_ids, lock)
+
+
+def replace_calendar(serv_obj, store, summary, cal_id, cal_ids=None, lock=None):
+    """
+    Forget a deleted calendar's cached id and state, return the id of the calendar with summary made anew
+    under lock a thread that comes second finds the calendar the first one made instead of making another
+    """
+
+    with lock or nullcontext():
+        print(f'calendar {summary} was deleted, creating it again')
+        forget_cal_id(summary, cal_ids)
+        store.forget(cal_id)
+        return get_cal_id(serv_obj, summary, cal_ids)
+
+
+def sync_file(path='schedule.jsonl', summary='schedule_migrater', dry_run=False, reconcile=False,
+              state_path=STATE_PATH):
+    """
+    Sync the days updated in a saved schedule to the calendar with summary, return the SyncPlan
+    the plan is made from the local state store, the calendar is only listed when reconciling
+
+    :param reconcile: bool, list the calendar even if the store was reconciled recently
+    """
+
+    # files saved before normalize.py existed can have duplicates
+    schedule, normalized = storage.load(path).normalize()
+    if normalized.overlaps:
+        print(normalized)
+    service = get_service(load_credentials())
+    calendar_id = get_cal_id(service, summary)
+    with StateStore(state_path) as store:
+        _, plan, errors = sync_events(
+            service, store, summary, calendar_id, schedule, schedule.days_updated, reconcile, dry_run
+        )
+    print(plan)
+    print_errors(errors, 'syncing event')
+    if any(is_gone(error) for _, error in errors):
+        print('the calendar was changed outside of schedule_migrater, sync again with --reconcile')
+    return plan
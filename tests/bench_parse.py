@@ -0,0 +1,48 @@
+"""
+Benchmarks of Schedule.parse on the committed fixtures, per engine and scale factor
+the tracemalloc peak per element of one more, untimed, parse goes in extra_info
+not collected by default, run with: python -m pytest tests/bench_parse.py
+"""
+
+import os
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from JsonDateTime import JsonDateTime
+from scraper import Schedule
+import fixtures
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'synthetic_week.json')
+ENGINES = ['python', 'numpy']
+SCALES = [1, 10, 50]
+
+
+@pytest.mark.parametrize('factor', SCALES)
+@pytest.mark.parametrize('engine', ENGINES)
+def test_parse(benchmark, engine, factor):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    fixture = fixtures.load(FIXTURE)
+    payload = fixtures.scale(fixture['elements'], factor)
+    driver = fixtures.ReplayDriver(payload)
+    dt = JsonDateTime(fixture['year'], 1, 1)
+
+    events, _ = benchmark(Schedule.parse, driver, dt, engine)
+    elements = sum(len(dicts) for dicts in payload.values())
+    benchmark.extra_info['elements'] = elements
+    benchmark.extra_info['peak_bytes_per_element'] = peak_memory(driver, dt, engine) / elements
+    assert events
+
+
+def peak_memory(driver, dt, engine):
+    """Peak bytes traced while parsing once, outside the timed rounds since tracemalloc slows them down"""
+
+    tracemalloc.start()
+    try:
+        Schedule.parse(driver, dt, engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from batch import Target, run
+from scraper import Schedule
+import fixtures
+import storage
+
+
+class Browser(fixtures.ReplayDriver):
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Week number -> payload the browser shows for it, instead of a logged in browser"""
+
+    pages = {
+        34: fixtures.synthetic(4, seed=0, monday=(17, 8)),
+        35: fixtures.synthetic(4, seed=1, monday=(24, 8)),
+    }
+    browser = Browser(None)
+
+    def open_week(browser, school, sche_type, schedule_id, week):
+        browser.payload = pages[week]
+
+    monkeypatch.setattr(Schedule, 'start_browser', lambda headless=False: browser)
+    monkeypatch.setattr(Schedule, 'login', lambda browser, user_name, user_password: None)
+    monkeypatch.setattr(Schedule, 'open_week', open_week)
+    return pages
+
+
+def config(tmp_path):
+    return {
+        'username': 'ab61274',
+        'cache': str(tmp_path / 'weeks.json'),
+        'targets': [Target('Skolan', 'class', '7A', [34, 35], str(tmp_path / '7A.jsonl'))]
+    }
+
+
+def weeks(path):
+    return sorted({event.start.isocalendar()[1] for event in storage.load(path)})
+
+
+def test_unchanged_weeks_are_kept_in_the_output(tmp_path, pages):
+    run(config(tmp_path), 'password')
+    events = len(storage.load(str(tmp_path / '7A.jsonl')))
+
+    pages[35] = fixtures.synthetic(6, seed=2, monday=(24, 8))
+    run(config(tmp_path), 'password')
+    schedule = storage.load(str(tmp_path / '7A.jsonl'))
+    assert weeks(str(tmp_path / '7A.jsonl')) == [34, 35]
+    assert len(schedule) > events
+    assert len(schedule.days_updated) == 10
+
+
+def test_weeks_are_only_cached_once_saved(tmp_path, pages, monkeypatch):
+    def fail(schedule, path):
+        raise OSError('disk full')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(storage, 'save', fail)
+        with pytest.raises(OSError):
+            run(config(tmp_path), 'password')
+    assert not (tmp_path / 'weeks.json').exists() or json.loads((tmp_path / 'weeks.json').read_text()) == []
+
+    # the weeks weren't cached, so they're written this time
+    run(config(tmp_path), 'password')
+    assert weeks(str(tmp_path / '7A.jsonl')) == [34, 35]
+    assert len(json.loads((tmp_path / 'weeks.json').read_text())) == 2
@@ -0,0 +1,20 @@
+import os
+
+from cache import FileCache, DiscoveryCache
+
+
+def test_file_cache_saves_without_leaving_temporary_files(tmp_path):
+    path = str(tmp_path / 'cache' / 'calendars.json')
+    FileCache(path).set('schedule_migrater', 'calendar0')
+
+    assert FileCache(path).get('schedule_migrater') == 'calendar0'
+    assert os.listdir(tmp_path / 'cache') == ['calendars.json']
+
+
+def test_discovery_cache_round_trip(tmp_path):
+    cache = DiscoveryCache(str(tmp_path / 'discovery'))
+    cache.set('https://example.com/discovery', '{"kind": "discovery#restDescription"}')
+
+    assert cache.get('https://example.com/discovery') == '{"kind": "discovery#restDescription"}'
+    assert cache.get('https://example.com/other') is None
+    assert len(os.listdir(tmp_path / 'discovery')) == 1
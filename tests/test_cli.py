@@ -0,0 +1,12 @@
+import argparse
+
+import cli
+
+
+def test_startup_imports_no_heavy_modules(capsys):
+    # only the heavy modules are checked here, timings on a shared test machine vary too much for the budget
+    code = cli.check_startup(argparse.Namespace(budget_ms=float('inf')))
+
+    output = capsys.readouterr().out
+    assert 'heavy modules' not in output, output
+    assert code == 0
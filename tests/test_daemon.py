@@ -0,0 +1,90 @@
+from selenium.common.exceptions import WebDriverException
+
+import os
+
+from JsonDateTime import JsonDateTime
+from batch import Target
+from loadtest import FakeCalendarApi
+from scraper import Schedule
+import daemon
+import fixtures
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'synthetic_week.json')
+# the synthetic week's monday is 17/8
+WEEK = 34
+
+
+def test_week_poll_interval_doubles_up_to_max_and_resets_on_change():
+    poll = daemon.WeekPoll(Target('school', 'class', '7A', [WEEK]), WEEK, 300, 2000)
+
+    intervals = []
+    for now in range(4):
+        poll.unchanged(now)
+        intervals.append(poll.interval)
+    assert intervals == [600, 1200, 2000, 2000]
+    assert poll.due == 3 + 2000
+
+    poll.changed(10)
+    assert poll.interval == 300 and poll.due == 310
+
+    # a failed poll is retried soon, without touching the interval
+    poll.unchanged(20)
+    poll.failed(30)
+    assert poll.interval == 600 and poll.due == 330
+
+
+class SessionDriver(fixtures.ReplayDriver):
+    """Serves the fixture until its session runs out"""
+
+    def __init__(self, payload, expired=False):
+        super().__init__(payload)
+        self.expired = expired
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class Now(JsonDateTime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 8, 17, 7)
+
+
+def test_daemon_logs_in_again_after_a_webdriver_error(tmp_path, monkeypatch):
+    payload = fixtures.load(FIXTURE)['elements']
+    # the first browser's session has run out, the one after the new login hasn't
+    drivers = [SessionDriver(payload, expired=True), SessionDriver(payload)]
+    logins = []
+
+    def open_week(browser, school, sche_type, schedule_id, week):
+        if browser.expired:
+            raise WebDriverException('invalid session id')
+
+    monkeypatch.setattr(Schedule, 'start_browser', lambda headless: drivers[len(logins)])
+    monkeypatch.setattr(Schedule, 'login', lambda browser, user, password: logins.append(browser))
+    monkeypatch.setattr(Schedule, 'open_week', open_week)
+    api = FakeCalendarApi(1000)
+    monkeypatch.setattr(daemon, 'get_service', lambda credentials: api.service())
+    monkeypatch.setattr(daemon, 'get_cal_id', lambda service, summary: api.add_calendar(summary)['id'])
+    monkeypatch.setattr(daemon, 'JsonDateTime', Now)
+
+    config = {
+        'username': 'user',
+        'targets': [Target('school', 'class', '7A', [WEEK])],
+        'cache': str(tmp_path / 'weeks.json'),
+        'state': str(tmp_path / 'state.sqlite3'),
+    }
+    watcher = daemon.Daemon(config, 'password', None)
+    try:
+        watcher.poll()
+    finally:
+        watcher.store.close()
+
+    assert logins == drivers
+    assert drivers[0].quit_called and not drivers[1].quit_called
+    assert watcher.last_error is None
+    poll, = watcher.polls
+    assert poll.interval == daemon.MIN_INTERVAL
+    assert len(api.events[watcher.calendar_id]) > 0
+    assert os.path.exists(config['state'])
@@ -0,0 +1,79 @@
+import os
+import stat
+
+import pytest
+
+from JsonDateTime import JsonDateTime
+from scraper import Event
+import export
+
+
+@pytest.fixture
+def umask():
+    old = os.umask(0o027)
+    yield 0o027
+    os.umask(old)
+
+
+def test_export_respects_the_umask(tmp_path, umask):
+    start = JsonDateTime(2026, 8, 17, 8, 10)
+    path = str(tmp_path / 'schedule.csv')
+    export.export([Event('Matematik', 'A101', start, JsonDateTime(2026, 8, 17, 9))], path)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert os.listdir(tmp_path) == ['schedule.csv']
+
+
+def test_cli_export_normalizes_unless_raw(tmp_path):
+    import cli
+    import storage
+    from scraper import Schedule
+
+    first = Event('Matematik', 'A101', JsonDateTime(2026, 8, 17, 8), JsonDateTime(2026, 8, 17, 8, 30))
+    second = Event('Matematik', 'A101', JsonDateTime(2026, 8, 17, 8, 30), JsonDateTime(2026, 8, 17, 9))
+    path = str(tmp_path / 'schedule.jsonl')
+    storage.save(Schedule([second, first, first], JsonDateTime(2026, 8, 17), []), path)
+
+    cli.main(['export', path, str(tmp_path / 'normalized.csv')])
+    cli.main(['export', path, str(tmp_path / 'raw.csv'), '--raw'])
+    # the header, then the split lesson merged into one row
+    assert (tmp_path / 'normalized.csv').read_text().splitlines()[1:] == [
+        'Matematik,08/17/2026,8:00 AM,08/17/2026,9:00 AM,A101'
+    ]
+    assert len((tmp_path / 'raw.csv').read_text().splitlines()) == 4
+
+
+def ics_events(text):
+    """Unfold the lines of an ics file and return each VEVENT as a dict of property -> value"""
+
+    lines = text.replace('\r\n ', '').split('\r\n')
+    events = []
+    for line in lines:
+        if line == 'BEGIN:VEVENT':
+            events.append({})
+        elif events and line != 'END:VEVENT' and ':' in line:
+            name, value = line.split(':', 1)
+            events[-1].setdefault(name, value)
+    return events
+
+
+def test_write_ics_escapes_folds_and_keeps_uids(tmp_path):
+    start, stop = JsonDateTime(2026, 8, 17, 8, 10), JsonDateTime(2026, 8, 17, 9, 10)
+    info = 'Läxa: kapitel 3; ta med miniräknare, linjal och passare\ninlämning på fredag ' * 2
+    lesson = Event('Matematik', 'A101', start, stop, info)
+    moved_room = Event('Matematik', 'B204', start, stop, 'Ny sal')
+    first, second = str(tmp_path / 'first.ics'), str(tmp_path / 'second.ics')
+    export.export([lesson], first)
+    export.export([moved_room], second)
+
+    with open(first, newline='') as file:
+        text = file.read()
+    assert all(len(line.encode('utf-8')) <= 75 for line in text.split('\r\n'))
+    assert text.count('\r\n ') > 1
+    event, = ics_events(text)
+    assert event['DESCRIPTION'].startswith('Läxa: kapitel 3\\; ta med miniräknare\\, linjal och passare\\ninlämning')
+    assert event['DTSTART;TZID=Europe/Stockholm'] == '20260817T081000'
+
+    # same slot, different room and info: a re-import updates the lesson instead of adding it again
+    with open(second, newline='') as file:
+        assert ics_events(file.read())[0]['UID'] == event['UID']
@@ -0,0 +1,110 @@
+from apiclient.errors import HttpError
+import httplib2
+
+from datetime import date, timedelta
+
+from fanout import TokenBucket, Quota, SyncJob, FanOut
+from gcal import MAX_RETRIES
+from loadtest import FakeCalendarApi, make_week
+import sync
+
+MONDAY = date(2026, 8, 17)
+
+
+class FakeClock:
+    """Time that only moves when something sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_refills_at_its_rate_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(2, clock=clock)
+
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0.5]
+    clock.sleep(1.5)
+    # the third token was owed, the rest of the refill fills the bucket
+    assert bucket.reserve(2) == 0
+    clock.sleep(100)
+    # saved up tokens are capped at capacity, the rest of a big reservation waits
+    assert bucket.reserve(3) == 0.5
+
+
+def test_quota_holds_requests_to_the_project_rate():
+    clock = FakeClock()
+    quota = Quota(project_rate=10, user_rate=5, sleep=clock.sleep, clock=clock)
+
+    for _ in range(10):
+        for user in 'abcd':
+            quota.acquire(user)
+    # a second of burst, then 10 a second, though the four users could make 20 a second between them
+    assert abs(clock.now - 3.0) < 1e-9
+
+
+def test_quota_holds_a_user_to_the_user_rate():
+    clock = FakeClock()
+    quota = Quota(project_rate=10, user_rate=5, sleep=clock.sleep, clock=clock)
+
+    for _ in range(25):
+        quota.acquire('a')
+    assert abs(clock.now - 4.0) < 1e-9
+
+
+def test_week_priority_puts_upcoming_weeks_first():
+    today = date(2026, 8, 19)
+    mondays = [MONDAY + timedelta(weeks=weeks) for weeks in (-2, -1, 0, 1, 2)]
+
+    ordered = sorted(mondays, key=lambda monday: SyncJob.week_priority(monday, today))
+    assert ordered == [mondays[2], mondays[3], mondays[4], mondays[1], mondays[0]]
+
+
+def rate_limited():
+    return HttpError(httplib2.Response({'status': 429}), b'{}')
+
+
+def fan_out(tmp_path, monkeypatch, failures):
+    """A FanOut of one week to a fake calendar, whose sync is rate limited failures times first"""
+
+    api = FakeCalendarApi(1000)
+    clock = FakeClock()
+    quota = Quota(sleep=clock.sleep, clock=clock)
+    fan = FanOut(api.service, workers=1, quota=quota, state_path=str(tmp_path / 'state.sqlite3'), cal_ids=False)
+    events, days = make_week(MONDAY)
+    fan.add('7A', events, days, today=MONDAY)
+
+    calls = []
+    sync_events = sync.sync_events
+
+    def flaky_sync_events(*args, **kwargs):
+        calls.append(args[2])
+        if len(calls) <= failures:
+            raise rate_limited()
+        return sync_events(*args, **kwargs)
+
+    monkeypatch.setattr(sync, 'sync_events', flaky_sync_events)
+    return fan, api, calls
+
+
+def test_fan_out_requeues_rate_limited_jobs(tmp_path, monkeypatch):
+    fan, api, calls = fan_out(tmp_path, monkeypatch, failures=2)
+
+    assert fan.run() == []
+    assert calls == ['7A'] * 3
+    assert fan.done == 1
+    assert len(api.events[fan.calendar_ids['7A']]) == len(make_week(MONDAY)[0])
+
+
+def test_fan_out_gives_up_after_max_retries(tmp_path, monkeypatch):
+    fan, api, calls = fan_out(tmp_path, monkeypatch, failures=MAX_RETRIES + 1)
+
+    errors = fan.run()
+    assert len(calls) == MAX_RETRIES + 1
+    assert fan.done == 0
+    assert [error.resp.status for _, error in errors] == [429]
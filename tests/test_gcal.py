@@ -0,0 +1,181 @@
+from apiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest, HttpMockSequence, HttpRequest
+from googleapiclient.model import JsonModel
+import httplib2
+import json
+
+import gcal
+
+
+def http_error(status, reason=None):
+    content = {'error': {'code': status, 'errors': [{'reason': reason}] if reason else []}}
+    return HttpError(httplib2.Response({'status': status}), json.dumps(content).encode('utf-8'))
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.request_ids = []
+
+    def add(self, request, request_id):
+        self.request_ids.append(request_id)
+
+    def execute(self):
+        self.service.batches.append(list(self.request_ids))
+        if self.service.refuse_batches:
+            self.service.refuse_batches -= 1
+            raise self.service.batch_error
+        for request_id in self.request_ids:
+            failures = self.service.failures.get(request_id)
+            if failures:
+                self.service.failures[request_id] -= 1
+                self.callback(request_id, None, http_error(429))
+            else:
+                self.callback(request_id, {'id': request_id}, None)
+
+
+class FakeService:
+    """Answers batches, refusing the first refuse_batches of them and failing requests failures[id] times"""
+
+    def __init__(self, refuse_batches=0, batch_error=None, failures=None):
+        self.refuse_batches = refuse_batches
+        self.batch_error = batch_error or http_error(429)
+        self.failures = failures or {}
+        self.batches = []
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+BATCH_URI = 'https://www.googleapis.com/batch/calendar/v3'
+EVENTS_URI = 'https://www.googleapis.com/calendar/v3/calendars/cal/events'
+
+
+class HttpService:
+    """Sends batches through googleapiclient itself, to an http that answers with canned multipart responses"""
+
+    def __init__(self, responses):
+        self.http = HttpMockSequence(responses)
+
+    def new_batch_http_request(self, callback):
+        return BatchHttpRequest(callback=callback, batch_uri=BATCH_URI)
+
+    def insert(self, body):
+        return HttpRequest(self.http, JsonModel().response, EVENTS_URI, method='POST', body=json.dumps(body),
+                           headers={'content-type': 'application/json'})
+
+
+def batch_response(*parts):
+    """
+    A multipart/mixed batch response as the endpoint sends it
+
+    :param parts: tuple of (request id, status line, json body)
+    """
+
+    lines = []
+    for request_id, status, body in parts:
+        content = json.dumps(body)
+        lines += [
+            '--batch_boundary',
+            'Content-Type: application/http',
+            'Content-ID: <response-base + {}>'.format(request_id),
+            '',
+            'HTTP/1.1 {}'.format(status),
+            'Content-Type: application/json; charset=UTF-8',
+            'Content-Length: {}'.format(len(content)),
+            '',
+            content,
+        ]
+    lines.append('--batch_boundary--')
+    headers = {'status': '200', 'content-type': 'multipart/mixed; boundary=batch_boundary'}
+    return headers, '\r\n'.join(lines).encode('utf-8')
+
+
+RATE_LIMITED = {'error': {'code': 429, 'errors': [{'reason': 'rateLimitExceeded'}]}}
+
+
+def test_execute_batch_parses_multipart_responses():
+    service = HttpService([
+        batch_response(
+            (0, '200 OK', {'id': 'a'}),
+            (1, '429 Too Many Requests', RATE_LIMITED),
+            (2, '200 OK', {'id': 'c'}),
+        ),
+        # only the rate limited request is sent again, a batch missing any of its parts fails to parse
+        batch_response((1, '200 OK', {'id': 'b'})),
+    ])
+    requests = [service.insert({'summary': summary}) for summary in 'abc']
+    sleeps = []
+    responses, errors = gcal.execute_batch(service, requests, sleep=sleeps.append)
+
+    assert responses == [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}]
+    assert errors == []
+    assert len(sleeps) == 1
+
+
+def test_execute_batch_reports_multipart_errors():
+    service = HttpService([
+        batch_response((0, '200 OK', {'id': 'a'}), (1, '404 Not Found', {'error': {'code': 404, 'errors': []}})),
+    ])
+    requests = [service.insert({'summary': summary}) for summary in 'ab']
+    responses, errors = gcal.execute_batch(service, requests, sleep=lambda seconds: None)
+
+    assert responses == [{'id': 'a'}, None]
+    assert [idx for idx, error in errors] == [1]
+    assert errors[0][1].resp.status == 404
+
+
+def test_execute_batch_chunks_requests():
+    service = FakeService()
+    responses, errors = gcal.execute_batch(service, list(range(120)), batch_size=50, sleep=lambda seconds: None)
+
+    assert [len(batch) for batch in service.batches] == [50, 50, 20]
+    assert responses == [{'id': str(idx)} for idx in range(120)]
+    assert errors == []
+
+
+def test_execute_batch_retries_rate_limited_requests():
+    service = FakeService(failures={'1': 2, '3': 1})
+    sleeps = []
+    responses, errors = gcal.execute_batch(service, list(range(5)), sleep=sleeps.append)
+
+    assert service.batches == [['0', '1', '2', '3', '4'], ['1', '3'], ['1']]
+    assert len(sleeps) == 2 and sleeps[0] < sleeps[1]
+    assert all(responses) and errors == []
+
+
+def test_execute_batch_retries_a_refused_batch():
+    service = FakeService(refuse_batches=1, batch_error=http_error(403, 'userRateLimitExceeded'))
+    responses, errors = gcal.execute_batch(service, list(range(3)), sleep=lambda seconds: None)
+
+    assert service.batches == [['0', '1', '2'], ['0', '1', '2']]
+    assert all(responses) and errors == []
+
+
+def test_execute_batch_gives_up_after_max_retries():
+    service = FakeService(failures={'0': 10})
+    responses, errors = gcal.execute_batch(service, list(range(2)), max_retries=2, sleep=lambda seconds: None)
+
+    assert len(service.batches) == 3
+    assert responses[0] is None and responses[1] == {'id': '1'}
+    assert [idx for idx, error in errors] == [0]
+    assert errors[0][1].resp.status == 429
+
+
+def test_execute_batch_raises_other_batch_errors():
+    service = FakeService(refuse_batches=1, batch_error=http_error(400))
+    try:
+        gcal.execute_batch(service, list(range(3)), sleep=lambda seconds: None)
+    except HttpError as error:
+        assert error.resp.status == 400
+    else:
+        raise AssertionError('expected HttpError')
+
+
+def test_is_rate_limit():
+    assert gcal.is_rate_limit(http_error(429))
+    assert gcal.is_rate_limit(http_error(403, 'rateLimitExceeded'))
+    assert not gcal.is_rate_limit(http_error(403, 'forbidden'))
+    assert not gcal.is_rate_limit(http_error(404))
+    assert not gcal.is_rate_limit(ValueError())
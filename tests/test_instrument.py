@@ -0,0 +1,63 @@
+from selenium.webdriver.remote.webelement import WebElement
+
+import instrument
+
+
+class FakeDriver:
+    """Answers every command a WebElement sends, like a remote webdriver would"""
+
+    title = 'Skola24'
+    _is_remote = False
+
+    def __init__(self):
+        self.commands = []
+
+    def execute(self, command, params=None):
+        self.commands.append(command)
+        return {'value': 'text'}
+
+    def get(self, url):
+        self.commands.append('get')
+
+    def find_element_by_name(self, name):
+        return WebElement(self, name)
+
+    def find_elements_by_class_name(self, class_name):
+        return [WebElement(self, f'{class_name}{idx}') for idx in range(3)]
+
+
+def webdriver_calls():
+    _, counters, _ = instrument.snapshot()
+    return counters.get('webdriver calls', 0)
+
+
+def test_counted_driver_counts_driver_and_element_calls():
+    instrument.recorder.reset()
+    driver = FakeDriver()
+    browser = instrument.CountedDriver(driver)
+
+    browser.get('https://example.com')
+    element = browser.find_element_by_name('user')
+    element.send_keys('ab61274')
+    element.click()
+    assert webdriver_calls() == 4
+    assert len(driver.commands) == 3
+
+    assert [element.text for element in browser.find_elements_by_class_name('box')] == ['text'] * 3
+    assert webdriver_calls() == 8
+    assert browser.title == 'Skola24'
+    assert webdriver_calls() == 8
+
+
+def test_cli_reports_timings_even_when_the_command_fails(tmp_path, monkeypatch):
+    import cli
+
+    reports = []
+    monkeypatch.setattr(instrument, 'report', reports.append)
+    try:
+        cli.main(['export', str(tmp_path / 'missing.jsonl'), str(tmp_path / 'schedule.csv')])
+    except OSError:
+        pass
+    else:
+        raise AssertionError('exporting a missing schedule should fail')
+    assert reports == [None]
@@ -0,0 +1,92 @@
+from datetime import date, datetime
+
+import gcal
+
+
+class FakeRequest:
+    def __init__(self, page):
+        self.page = page
+
+    def execute(self):
+        return self.page
+
+
+class FakeEvents:
+    """events() of a calendar whose listing comes in pages of page_size items"""
+
+    def __init__(self, items, page_size):
+        self.pages = [items[idx:idx + page_size] for idx in range(0, len(items), page_size)] or [[]]
+        self.calls = []
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+        idx = int(kwargs['pageToken'] or 0)
+        page = {'items': self.pages[idx]}
+        if idx + 1 < len(self.pages):
+            page['nextPageToken'] = str(idx + 1)
+        return FakeRequest(page)
+
+
+class FakeService:
+    def __init__(self, items, page_size=2):
+        self.fake_events = FakeEvents(items, page_size)
+
+    def events(self):
+        return self.fake_events
+
+
+def timed_event(id_, start):
+    return {'id': id_, 'start': {'dateTime': start}}
+
+
+ITEMS = [
+    timed_event('sunday', '2026-08-16T23:30:00+02:00'),
+    timed_event('monday', '2026-08-17T08:10:00+02:00'),
+    {'id': 'all day', 'start': {'date': '2026-08-17'}},
+    timed_event('tuesday', '2026-08-18T09:00:00+02:00'),
+    timed_event('wednesday', '2026-08-19T10:00:00+02:00'),
+    timed_event('thursday', '2026-08-20T11:00:00+02:00'),
+    timed_event('friday late', '2026-08-21T08:00:00+02:00'),
+]
+
+
+def test_list_events_follows_every_page():
+    service = FakeService(ITEMS, page_size=2)
+    events = list(gcal.list_events(service, 'cal', date(2026, 8, 16), date(2026, 8, 22), gcal.ID_FIELDS))
+
+    assert [event['id'] for event in events] == [event['id'] for event in ITEMS]
+    calls = service.fake_events.calls
+    assert [call['pageToken'] for call in calls] == [None, '1', '2', '3']
+    for call in calls:
+        assert call['calendarId'] == 'cal'
+        assert call['timeMin'] == '2026-08-16T00:00:00Z'
+        assert call['timeMax'] == '2026-08-22T00:00:00Z'
+        assert call['singleEvents'] is True
+        assert call['maxResults'] == gcal.PAGE_SIZE
+        assert call['fields'] == 'nextPageToken,items(id,start)'
+
+
+def test_get_events_by_dts_filters_days():
+    service = FakeService(ITEMS, page_size=3)
+    # not consecutive, so the listed range covers days that have to be filtered out
+    dts = [datetime(2026, 8, 17, 12), datetime(2026, 8, 19), datetime(2026, 8, 17)]
+    events = gcal.get_events_by_dts(service, 'cal', dts)
+
+    assert [event['id'] for event in events] == ['monday', 'wednesday']
+    calls = service.fake_events.calls
+    assert len(calls) == 3
+    # a day of margin on each side of the days asked for
+    assert calls[0]['timeMin'] == '2026-08-16T00:00:00Z'
+    assert calls[0]['timeMax'] == '2026-08-21T00:00:00Z'
+    assert calls[0]['fields'] == f'nextPageToken,items({gcal.SYNC_FIELDS})'
+
+
+def test_get_event_ids_by_dts():
+    service = FakeService(ITEMS)
+    assert gcal.get_event_ids_by_dts(service, 'cal', [datetime(2026, 8, 18)]) == ['tuesday']
+
+
+def test_get_events_by_dts_without_days_makes_no_calls():
+    service = FakeService(ITEMS)
+    assert gcal.get_events_by_dts(service, 'cal', []) == []
+    assert service.fake_events.calls == []
@@ -0,0 +1,47 @@
+import glob
+import os
+
+import pytest
+
+from JsonDateTime import JsonDateTime
+from scraper import Schedule
+import fixtures
+
+# the committed fixtures are synthetic, made with fixtures.py synthetic,
+# pages recorded with fixtures.py record are compared as well once they are put here
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'fixtures', '*.json')))
+SCALES = [1, 3, 10]
+
+
+def event_tuples(events):
+    return [(event.act, event.place, event.start, event.stop, event.info) for event in events]
+
+
+def parse(fixture, factor, engine, script=True):
+    driver = fixtures.ReplayDriver(fixtures.scale(fixture['elements'], factor), script)
+    events, days = Schedule.parse(driver, JsonDateTime(fixture['year'], 1, 1), engine)
+    return event_tuples(events), days
+
+
+@pytest.mark.parametrize('factor', SCALES)
+@pytest.mark.parametrize('path', FIXTURES, ids=os.path.basename)
+def test_numpy_engine_matches_python(path, factor):
+    pytest.importorskip('numpy')
+    fixture = fixtures.load(path)
+
+    python_events, python_days = parse(fixture, factor, 'python')
+    numpy_events, numpy_days = parse(fixture, factor, 'numpy')
+    assert python_events
+    assert numpy_events == python_events
+    assert numpy_days == python_days
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=os.path.basename)
+def test_per_element_path_matches_snapshot(path):
+    fixture = fixtures.load(path)
+
+    assert parse(fixture, 1, 'python', script=False) == parse(fixture, 1, 'python')
+
+
+def test_fixtures_are_committed():
+    assert FIXTURES
@@ -0,0 +1,31 @@
+from selenium.common.exceptions import TimeoutException
+import pytest
+
+from scraper import Schedule
+
+
+class FakeBrowser:
+    """Renders nothing, the render script gives up with false"""
+
+    def __init__(self):
+        self.script_timeout = None
+        self.polled = False
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    def execute_async_script(self, script, quiet, timeout_ms):
+        assert timeout_ms / 1000 < self.script_timeout
+        return False
+
+    def execute_script(self, script):
+        self.polled = True
+        return [0, 0, '', '']
+
+
+def test_wait_for_render_gives_up_once_the_script_does():
+    browser = FakeBrowser()
+    with pytest.raises(TimeoutException):
+        Schedule.wait_for_render(browser, timeout=0.1)
+    # the script's false is the answer, the timeout isn't waited out again by polling
+    assert not browser.polled
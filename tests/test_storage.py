@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from JsonDateTime import JsonDateTime
+from scraper import Event, Schedule
+import storage
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'storage')
+
+
+def fields(events):
+    return [(event.act, event.place, event.start, event.stop, event.info) for event in events]
+
+
+def make_schedule():
+    events = [
+        Event('Matematik', 'A101', JsonDateTime(2026, 8, 17, 8, 10), JsonDateTime(2026, 8, 17, 9, 10)),
+        Event('Svenska', 'B204', JsonDateTime(2026, 8, 18, 10), JsonDateTime(2026, 8, 18, 11), 'Ta med boken'),
+        Event('Idrott, ute', 'Sporthallen', JsonDateTime(2026, 8, 18, 13), JsonDateTime(2026, 8, 18, 14, 30)),
+    ]
+    return Schedule(events, JsonDateTime(2026, 8, 17, 7, 30), [JsonDateTime(2026, 8, 17), JsonDateTime(2026, 8, 18)])
+
+
+@pytest.mark.parametrize('extension', ['jsonl', 'json', 'msgpack'])
+def test_save_load_round_trip(tmp_path, extension):
+    if extension == 'msgpack':
+        pytest.importorskip('msgpack')
+    schedule = make_schedule()
+    path = str(tmp_path / f'schedule.{extension}')
+    storage.save(schedule, path)
+    loaded = storage.load(path)
+
+    assert fields(loaded) == fields(schedule)
+    assert loaded.date_created == schedule.date_created
+    assert loaded.days_updated == schedule.days_updated
+    assert fields(storage.iter_events(path)) == fields(schedule)
+    assert os.listdir(tmp_path) == [f'schedule.{extension}']
+
+
+def test_load_legacy_schedule_json():
+    schedule = storage.load(os.path.join(FIXTURES, 'schedule.json'))
+
+    assert fields(schedule) == [
+        ('Matematik', 'A101', JsonDateTime(2019, 9, 2, 8, 10), JsonDateTime(2019, 9, 2, 9, 10), ''),
+        ('Svenska', 'B204', JsonDateTime(2019, 9, 3, 10), JsonDateTime(2019, 9, 3, 11), 'Ta med boken'),
+    ]
+    assert schedule.date_created == JsonDateTime(2019, 9, 2, 7, 30)
+    assert schedule.days_updated == [JsonDateTime(2019, 9, 2), JsonDateTime(2019, 9, 3)]
+
+
+def test_load_rejects_an_unknown_format(tmp_path):
+    path = tmp_path / 'schedule.jsonl'
+    path.write_text('{"format": 2}\n')
+    with pytest.raises(ValueError):
+        storage.load(str(path))
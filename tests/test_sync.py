@@ -0,0 +1,160 @@
+from apiclient.errors import HttpError
+import httplib2
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import time
+
+from batch import Target
+from cache import FileCache
+from gcal import get_cal_id
+from loadtest import FakeCalendarApi, FakeBatch, FakeService, make_week
+from pipeline import Pipeline, Week
+from scraper import Event
+from state import StateStore
+import gcal
+import sync
+
+MONDAY = date(2026, 8, 17)
+
+
+def sync_week(service, store, cal_id, events, days):
+    plan = sync.SyncPlan.from_events(events, sync.calendar_events(service, store, cal_id, days))
+    return plan, plan.apply(service, cal_id, store)
+
+
+def moved(events):
+    """The first lesson of the week an hour later"""
+
+    first = events[0]
+    hour = timedelta(hours=1)
+    return [Event(first.act, first.place, first.start + hour, first.stop + hour)] + events[1:]
+
+
+def test_pipeline_upload_keeps_the_store_in_step(tmp_path):
+    api = FakeCalendarApi(1000)
+    service = api.service()
+    cal_id = api.add_calendar('schedule_migrater')['id']
+    state_path = str(tmp_path / 'state.sqlite3')
+    events, days = make_week(MONDAY)
+    with StateStore(state_path) as store:
+        sync_week(service, store, cal_id, events, days)
+
+    pipeline = Pipeline({'state': state_path}, None, None)
+    pipeline.local.service = service
+    pipeline.calendar_id = cal_id
+    pipeline.upload(Week(Target('school', 'class', '7A', [34]), 34, moved(events), days))
+    pipeline.close_stores()
+
+    # a later sync plans from the store, which has to know what the pipeline did
+    with StateStore(state_path) as store:
+        plan, errors = sync_week(service, store, cal_id, moved(events), days)
+    assert len(plan) == 0
+    assert errors == []
+    assert len(api.events[cal_id]) == len(events)
+
+
+class SlowCalendarApi(FakeCalendarApi):
+    """Takes a while to make a calendar, so threads that both find theirs gone overlap"""
+
+    def add_calendar(self, summary):
+        time.sleep(0.05)
+        return super().add_calendar(summary)
+
+
+class FailingBatch(FakeBatch):
+    def execute(self):
+        self.api.batches += 1
+        if self.api.batches > self.api.fail_after:
+            raise HttpError(httplib2.Response({'status': 500}), b'{}')
+        super().execute()
+
+
+class FailingService(FakeService):
+    def new_batch_http_request(self, callback):
+        return FailingBatch(self.api, callback)
+
+
+def test_apply_records_each_batch_as_it_completes():
+    api = FakeCalendarApi(1000)
+    api.batches = 0
+    api.fail_after = 1
+    service = FailingService(api)
+    cal_id = api.add_calendar('schedule_migrater')['id']
+    # 60 events, more than fit in one batch
+    events, days = make_week(MONDAY, lessons=12)
+    with StateStore(':memory:') as store:
+        try:
+            sync_week(service, store, cal_id, events, days)
+        except HttpError:
+            pass
+        else:
+            raise AssertionError('the second batch should have failed')
+
+        stored = {event['id'] for event in store.events_on_days(cal_id, days)}
+    assert stored == set(api.events[cal_id])
+    assert len(stored) == 50
+
+
+def delete_calendar(api, summary):
+    del api.events[api.calendars.pop(summary)]
+
+
+def test_sync_events_recreates_a_deleted_calendar(tmp_path):
+    api = FakeCalendarApi(1000)
+    service = api.service()
+    cal_ids = FileCache(str(tmp_path / 'calendars.json'))
+    cal_id = get_cal_id(service, 'schedule_migrater', cal_ids)
+    events, days = make_week(MONDAY)
+    with StateStore(':memory:') as store:
+        sync.sync_events(service, store, 'schedule_migrater', cal_id, events, days, cal_ids=cal_ids)
+        delete_calendar(api, 'schedule_migrater')
+
+        # the store was just reconciled, so the plan is made without listing the deleted calendar
+        new_id, plan, errors = sync.sync_events(
+            service, store, 'schedule_migrater', cal_id, moved(events), days, cal_ids=cal_ids
+        )
+        assert store.events_on_days(cal_id, days) == []
+    assert new_id != cal_id
+    assert cal_ids.get('schedule_migrater') == new_id
+    assert len(plan.inserts) == len(events)
+    assert errors == []
+    assert len(api.events[new_id]) == len(events)
+
+
+def test_sync_events_recreates_a_calendar_that_is_gone_when_listed(tmp_path):
+    api = FakeCalendarApi(1000)
+    service = api.service()
+    cal_ids = FileCache(str(tmp_path / 'calendars.json'))
+    cal_id = get_cal_id(service, 'schedule_migrater', cal_ids)
+    delete_calendar(api, 'schedule_migrater')
+    events, days = make_week(MONDAY)
+    with StateStore(':memory:') as store:
+        new_id, plan, errors = sync.sync_events(
+            service, store, 'schedule_migrater', cal_id, events, days, reconcile=True, cal_ids=cal_ids
+        )
+    assert new_id != cal_id
+    assert errors == []
+    assert len(api.events[new_id]) == len(events)
+
+
+def test_pipeline_uploads_recreate_a_deleted_calendar_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(gcal, 'calendar_ids', lambda: False)
+    api = SlowCalendarApi(1000)
+    service = api.service()
+    cal_id = api.add_calendar('schedule_migrater')['id']
+    delete_calendar(api, 'schedule_migrater')
+
+    pipeline = Pipeline({'state': str(tmp_path / 'state.sqlite3')}, None, None)
+    pipeline.service = lambda: service
+    pipeline.calendar_id = cal_id
+    target = Target('school', 'class', '7A', [34, 35])
+    weeks = [Week(target, week, *make_week(MONDAY + timedelta(weeks=week - 34))) for week in target.weeks]
+    with ThreadPoolExecutor(len(weeks)) as executor:
+        list(executor.map(pipeline.upload, weeks))
+    assert len(pipeline.stores) == len(weeks)
+    pipeline.close_stores()
+
+    assert pipeline.calendar_id == api.calendars['schedule_migrater']
+    assert list(api.events) == [pipeline.calendar_id]
+    assert len(api.events[pipeline.calendar_id]) == sum(len(week.events) for week in weeks)
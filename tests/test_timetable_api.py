@@ -0,0 +1,98 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import threading
+
+import pytest
+
+from JsonDateTime import JsonDateTime
+from timetable_api import TimetableClient, TimetableApiError, SCOPE
+
+HOST_NAME = 'example.skola24.se'
+UNIT_GUID = 'unit-guid'
+CLASS_GUID = 'class-guid-7a'
+LESSONS = [
+    {'dayOfWeekNumber': 1, 'timeStart': '08:10:00', 'timeEnd': '09:00:00', 'texts': ['Matematik', 'ABC', 'A101']},
+    {'dayOfWeekNumber': 1, 'timeStart': '09:00:00', 'timeEnd': '09:50:00', 'texts': ['Matematik', 'ABC', 'A101']},
+    {'dayOfWeekNumber': 3, 'timeStart': '10:00:00', 'timeEnd': '11:00:00', 'texts': ['Idrott']},
+]
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Answers the timetable viewer's api like the real one, and records the requests"""
+
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or 'null')
+        path = self.path[len('/api/'):]
+        self.requests.append((path, self.headers['X-Scope'], body))
+        data = getattr(self, path.replace('/', '_'))(body)
+        content = json.dumps({'data': data, 'error': None, 'exception': None}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+    def services_skola24_get_timetable_viewer_units(self, body):
+        assert body == {'getTimetableViewerUnitsRequest': {'hostName': HOST_NAME}}
+        return {'getTimetableViewerUnitsResponse': {'units': [{'unitId': 'Skolan', 'unitGuid': UNIT_GUID}]}}
+
+    def get_timetable_selection(self, body):
+        assert body['unitGuid'] == UNIT_GUID
+        assert [name for name, value in body['filters'].items() if value] == ['class']
+        return {'classes': [{'groupName': '7B', 'groupGuid': 'other'}, {'groupName': '7A', 'groupGuid': CLASS_GUID}]}
+
+    def get_timetable_render_key(self, body):
+        return {'key': 'render-key'}
+
+    def render_timetable(self, body):
+        assert body['renderKey'] == 'render-key'
+        assert (body['unitGuid'], body['selection'], body['selectionType']) == (UNIT_GUID, CLASS_GUID, 0)
+        return {'lessonInfo': LESSONS if body['week'] == 34 else []}
+
+
+@pytest.fixture
+def client():
+    StandIn.requests = []
+    server = HTTPServer(('127.0.0.1', 0), StandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield TimetableClient(
+            TimetableClient.make_session(),
+            api_url=f'http://127.0.0.1:{server.server_port}/api/',
+            host_name=HOST_NAME
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_weeks_reads_events_through_the_api(client):
+    events, days_updated = client.get_weeks('Skolan', 'class', '7A', [34, 35], JsonDateTime(2026, 8, 17))
+
+    assert [(event.act, event.place, event.info, event.start, event.stop) for event in events] == [
+        # the two blocks of the split lesson are merged
+        ('Matematik', 'A101', 'ABC', JsonDateTime(2026, 8, 17, 8, 10), JsonDateTime(2026, 8, 17, 9, 50)),
+        ('Idrott', '', '', JsonDateTime(2026, 8, 19, 10), JsonDateTime(2026, 8, 19, 11)),
+    ]
+    assert days_updated[0] == JsonDateTime(2026, 8, 17)
+    assert len(days_updated) == 10
+    assert [path for path, _, _ in StandIn.requests] == [
+        'services/skola24/get/timetable/viewer/units',
+        'get/timetable/selection',
+        'get/timetable/render/key',
+        'render/timetable',
+        'get/timetable/render/key',
+        'render/timetable',
+    ]
+    assert {scope for _, scope, _ in StandIn.requests} == {SCOPE}
+
+
+def test_unknown_schedule_id(client):
+    with pytest.raises(TimetableApiError):
+        client.get_weeks('Skolan', 'class', '9C', [34], JsonDateTime(2026, 8, 17))
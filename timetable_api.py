@@ -0,0 +1,190 @@
+"""
+Read schedules straight from the timetable viewer's json api, instead of scraping the rendered page
+the browser is only used once, to log in, and its cookies are reused for every request
+
+    browser = Schedule.start_browser(headless=True)
+    Schedule.login(browser, username, password)
+    client = TimetableClient.from_browser(browser)
+    browser.quit()
+    events, days_updated = client.get_weeks(school, 'class', '7A', [34, 35], dt)
+
+batch.py uses it with "source": "api" in its config
+"""
+
+from scraper import Event, Schedule
+from JsonDateTime import JsonDateTime
+from normalize import Normalized
+from instrument import api_call
+
+from requests.adapters import HTTPAdapter
+import requests
+
+from datetime import date
+
+API_URL = 'https://fns.stockholm.se/ng/api/'
+HOST_NAME = 'fns.stockholm.se'
+# public scope of the viewer's api, sent with every request
+SCOPE = '8a22163c-8662-4535-9050-bc5e1923df48'
+
+# for each schedule type: the selection type number the render endpoint takes,
+# the filter the selection endpoint takes, which is singular, and the list in its response, which is plural
+SELECTION_TYPES = {
+    'class': (0, 'class', 'classes'),
+    'personal id': (4, None, None),
+    'room': (3, 'room', 'rooms'),
+    'teacher': (7, 'teacher', 'teachers'),
+    'subject': (6, 'subject', 'subjects'),
+}
+# the viewer sends every filter, only the one asked for is true
+SELECTION_FILTERS = ('class', 'course', 'group', 'period', 'room', 'student', 'subject', 'teacher')
+
+# size of the rendered timetable, only affects the box coordinates, which aren't used
+RENDER_WIDTH = 1920
+RENDER_HEIGHT = 1080
+
+
+class TimetableApiError(Exception):
+    pass
+
+
+class TimetableClient:
+    def __init__(self, session, api_url=API_URL, host_name=HOST_NAME):
+        self.session = session
+        self.api_url = api_url
+        self.host_name = host_name
+        self.units = None
+        self.selections = {}
+
+    @classmethod
+    def from_browser(cls, browser, **kwargs):
+        """Make a client with the cookies of a logged in selenium browser"""
+
+        session = cls.make_session()
+        for cookie in browser.get_cookies():
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        return cls(session, **kwargs)
+
+    @staticmethod
+    def make_session(pool_size=10):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=3)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'X-Scope': SCOPE, 'Content-Type': 'application/json'})
+        return session
+
+    def post(self, path, body):
+        with api_call(f'timetable {path}'):
+            response = self.session.post(self.api_url + path, json=body, timeout=30)
+        response.raise_for_status()
+        content = response.json()
+        if content.get('error') or content.get('exception'):
+            raise TimetableApiError(f'{path}: {content.get("error") or content.get("exception")}')
+        return content['data']
+
+    def unit_guid(self, school):
+        if self.units is None:
+            data = self.post(
+                'services/skola24/get/timetable/viewer/units',
+                {'getTimetableViewerUnitsRequest': {'hostName': self.host_name}}
+            )
+            units = data['getTimetableViewerUnitsResponse']['units']
+            self.units = {unit['unitId']: unit['unitGuid'] for unit in units}
+        try:
+            return self.units[school]
+        except KeyError:
+            raise TimetableApiError(f'unknown school: {school}') from None
+
+    def selection(self, school, sche_type, schedule_id):
+        """Return the selection string the render endpoint wants for a schedule"""
+
+        if sche_type not in SELECTION_TYPES:
+            raise ValueError(f'unknown schedule type: {sche_type}')
+        if sche_type == 'personal id':
+            return self.post('encrypt/signature', {'signature': schedule_id})['signature']
+
+        key = (school, sche_type)
+        if key not in self.selections:
+            _, filter_name, list_name = SELECTION_TYPES[sche_type]
+            data = self.post('get/timetable/selection', {
+                'hostName': self.host_name,
+                'unitGuid': self.unit_guid(school),
+                'filters': {name: name == filter_name for name in SELECTION_FILTERS}
+            })
+            self.selections[key] = data.get(list_name) or []
+        for item in self.selections[key]:
+            names = [value for name, value in item.items() if not name.lower().endswith('guid')]
+            if schedule_id in names:
+                return next(value for name, value in item.items() if name.lower().endswith('guid'))
+        raise TimetableApiError(f'unknown {sche_type}: {schedule_id}')
+
+    def render_key(self):
+        return self.post('get/timetable/render/key', '')['key']
+
+    def week(self, unit_guid, sche_type, selection, year, week):
+        """Return lessonInfo of one week"""
+
+        selection_type, _, _ = SELECTION_TYPES[sche_type]
+        data = self.post('render/timetable', {
+            'renderKey': self.render_key(),
+            'host': self.host_name,
+            'unitGuid': unit_guid,
+            'startDate': None,
+            'endDate': None,
+            'scheduleDay': 0,
+            'blackAndWhite': False,
+            'width': RENDER_WIDTH,
+            'height': RENDER_HEIGHT,
+            'selectionType': selection_type,
+            'selection': selection,
+            'showHeader': False,
+            'periodText': '',
+            'week': week,
+            'year': year,
+            'privateFreeTextMode': None,
+            'privateSelectionMode': False,
+            'customerKey': ''
+        })
+        return data.get('lessonInfo') or []
+
+    def get_weeks(self, school, sche_type, schedule_id, weeks, dt):
+        """Same as Schedule.get_weeks, without a browser"""
+
+        unit_guid = self.unit_guid(school)
+        selection = self.selection(school, sche_type, schedule_id)
+        schedule = []
+        days_updated = []
+        for week in weeks:
+            lessons = self.week(unit_guid, sche_type, selection, dt.year, week)
+            schedule += [self.make_event(lesson, dt.year, week) for lesson in lessons]
+            days_updated += [
+                JsonDateTime(*date.fromisocalendar(dt.year, week, day).timetuple()[:3])
+                for day in range(1, 6)
+            ]
+        return Normalized.from_events(schedule).events, days_updated
+
+    @staticmethod
+    def make_event(lesson, year, week):
+        """Make Event from one lessonInfo item, texts are event, teacher, location like on the page"""
+
+        day = date.fromisocalendar(year, week, lesson['dayOfWeekNumber'])
+        start = JsonDateTime(day.year, day.month, day.day, *map(int, lesson['timeStart'].split(':')[:2]))
+        stop = JsonDateTime(day.year, day.month, day.day, *map(int, lesson['timeEnd'].split(':')[:2]))
+
+        texts = lesson.get('texts') or []
+        if len(texts) == 3:
+            event, teacher, location = texts
+        elif texts:
+            event, teacher, location = texts[0], '', ''
+        else:
+            event, teacher, location = '', '', ''
+        return Event(event, location, start, stop, teacher)
+
+
+def from_browser(browser, school, sche_type, schedule_id, weeks, dt=None):
+    """Return a Schedule read through the api, with the session of a logged in browser"""
+
+    dt = dt or JsonDateTime.now()
+    client = TimetableClient.from_browser(browser)
+    schedule, days_updated = client.get_weeks(school, sche_type, schedule_id, weeks, dt)
+    return Schedule(schedule, dt, days_updated)
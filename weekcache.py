@@ -0,0 +1,81 @@
+"""
+Cache of parsed weeks, keyed by (school, schedule type, id, year, week)
+each entry has a fingerprint of the page's elements, a week whose fingerprint hasn't changed
+doesn't need to be parsed or synced again, so a week is only put once its events are saved or synced
+"""
+
+from JsonDateTime import JsonDateTime
+import storage
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+
+MAX_ENTRIES = 1000
+
+
+class WeekCache:
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = self.load()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return OrderedDict(json.load(file))
+        except (OSError, ValueError):
+            return OrderedDict()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(list(self.entries.items()), file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def key(school, sche_type, schedule_id, year, week):
+        return '|'.join((school, sche_type, schedule_id, str(year), str(week)))
+
+    @staticmethod
+    def fingerprint(raw):
+        """Hash of a snapshot from SnappyElement.raw_snapshot"""
+
+        content = json.dumps(raw, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def unchanged(self, key, fingerprint):
+        entry = self.entries.get(key)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            self.misses += 1
+            return False
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def put(self, key, fingerprint, events, days_updated):
+        """Cache a week, call save to write the cache once all puts are done"""
+
+        self.entries[key] = {
+            'fingerprint': fingerprint,
+            'events': [storage.event_record(event) for event in events],
+            'days updated': [day.isoformat() for day in days_updated]
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key):
+        """Return (events, days updated) of a cached week, or None"""
+
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return (
+            [storage.event_from_record(record) for record in entry['events']],
+            [JsonDateTime.fromisoformat(day) for day in entry['days updated']]
+        )